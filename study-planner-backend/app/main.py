@@ -4,6 +4,11 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from app.models.database import init_db
 from app.routers import subjects, planner, ml, assignments, exams, notifications, admin
+from app.services.work_queue import analysis_queue
+from app.services.daily_jobs import daily_job_daemon
+from app.services.ml_model import ModelNotReady, model_holder
+from app.services.online_learner import online_learner
+from app.services.training_jobs import training_jobs
 import traceback
 
 app = FastAPI(title="Study Planner API", version="1.0.0")
@@ -45,10 +50,39 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         }
     )
 
+# No model version exists yet: a training job is running, so ask the client to retry
+@app.exception_handler(ModelNotReady)
+async def model_not_ready_handler(request: Request, exc: ModelNotReady):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc), "training_job": exc.job.get("job_id")},
+        headers={
+            "Retry-After": "5",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "*",
+            "Access-Control-Allow-Headers": "*",
+        }
+    )
+
 # Initialize database
 @app.on_event("startup")
 def startup_event():
     init_db()
+    # Daily reminder and priority refresh, independent of CRUD traffic
+    daily_job_daemon.start()
+    # Load the model now; on a fresh install this starts training the first version
+    try:
+        model_holder.get()
+    except ModelNotReady:
+        pass
+
+# Finish queued clash/reminder analysis before exiting
+@app.on_event("shutdown")
+def shutdown_event():
+    daily_job_daemon.stop()
+    analysis_queue.stop()
+    online_learner.checkpoint()
+    training_jobs.shutdown()
 
 # Include routers
 app.include_router(subjects.router)
@@ -1,9 +1,19 @@
 from sqlalchemy.orm import Session
 from app.models.database import Assignment
+from app.models import resource_versions
+from app.utils.date_utils import normalize_date
+
+def _normalize_dates(data: dict) -> dict:
+    # Clash detection range-scans the date column, which needs zero-padded dates
+    if data.get("due_date"):
+        data = dict(data, due_date=normalize_date(data["due_date"]))
+    return data
 
 def create_assignment(db: Session, assignment_data: dict):
+    assignment_data = _normalize_dates(assignment_data)
     assignment = Assignment(**assignment_data)
     db.add(assignment)
+    resource_versions.bump(db, "assignments")
     db.commit()
     db.refresh(assignment)
     return assignment
@@ -17,8 +27,9 @@ def get_all_assignments(db: Session):
 def update_assignment(db: Session, assignment_id: int, assignment_data: dict):
     assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
     if assignment:
-        for key, value in assignment_data.items():
+        for key, value in _normalize_dates(assignment_data).items():
             setattr(assignment, key, value)
+        resource_versions.bump(db, "assignments")
         db.commit()
         db.refresh(assignment)
     return assignment
@@ -27,6 +38,7 @@ def delete_assignment(db: Session, assignment_id: int):
     assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
     if assignment:
         db.delete(assignment)
+        resource_versions.bump(db, "assignments")
         db.commit()
     return assignment
 
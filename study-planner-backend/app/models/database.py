@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Text, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -27,7 +27,7 @@ class Assignment(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     subject_name = Column(String)
-    due_date = Column(String)  # YYYY-MM-DD
+    due_date = Column(String, index=True)  # YYYY-MM-DD
     estimated_hours = Column(Float, default=0.0)
     difficulty = Column(String, default="medium")  # easy, medium, hard
     priority = Column(String, default="medium")  # low, medium, high, urgent
@@ -40,12 +40,14 @@ class Exam(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     subject_name = Column(String)
-    exam_date = Column(String)  # YYYY-MM-DD
+    exam_date = Column(String, index=True)  # YYYY-MM-DD
     difficulty = Column(String, default="medium")  # easy, medium, hard
     past_score = Column(Float, default=0.0)
     chapters = Column(Integer, default=0)
     recommended_hours = Column(Float, default=0.0)
     priority = Column(String, default="medium")  # low, medium, high, urgent
+    actual_hours = Column(Float)  # Hours actually studied, reported after the exam
+    feedback_features = Column(String)  # JSON feature vector the model absorbed with actual_hours
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class StudyPlan(Base):
@@ -56,12 +58,30 @@ class StudyPlan(Base):
     item_type = Column(String)  # "assignment" or "exam"
     item_name = Column(String)
     day = Column(String)
-    date = Column(String)  # YYYY-MM-DD format for calendar views
+    date = Column(String, index=True)  # YYYY-MM-DD format for calendar views
     time_slot = Column(String)
     hours = Column(Float)
     category = Column(String)  # "assignment" or "exam"
+    subject_name = Column(String)  # Copied from the assignment/exam when the plan is saved
+    version_id = Column(Integer, index=True)  # plan_versions.id that added the row; NULL for rows saved before versioning
+    retired_version_id = Column(Integer, index=True)  # First plan version without the row; NULL while in the latest
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class PlanVersion(Base):
+    __tablename__ = "plan_versions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    input_hash = Column(String)  # Plan cache key of the inputs that produced this version
+    slot_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ActivePlan(Base):
+    __tablename__ = "active_plan"
+    
+    id = Column(Integer, primary_key=True)  # Single pointer row, id = 1
+    version_id = Column(Integer)  # Plan version readers see
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 class Notification(Base):
     __tablename__ = "notifications"
     
@@ -73,6 +93,17 @@ class Notification(Base):
     item_ids = Column(String)  # Comma-separated IDs
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    dedup_key = Column(String)  # Hash of type, item_ids and message
+    # "assignment:<id>" / "exam:<id>" of the (up to) two items, for equality lookups
+    first_item_key = Column(String, index=True)
+    second_item_key = Column(String, index=True)
+    
+    __table_args__ = (
+        # At most one unread notification per dedup key; read ones may repeat
+        Index("ix_notifications_dedup_unread", "dedup_key", unique=True, sqlite_where=text("is_read = 0")),
+        # Newest-first listing and keyset pagination, optionally unread only
+        Index("ix_notifications_read_created", "is_read", "created_at", "id"),
+    )
 
 class Reminder(Base):
     __tablename__ = "reminders"
@@ -80,15 +111,64 @@ class Reminder(Base):
     id = Column(Integer, primary_key=True, index=True)
     subject_id = Column(Integer)
     message = Column(Text)
-    reminder_date = Column(String)
+    reminder_date = Column(String, index=True)
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Retention scans by read state and age
+        Index("ix_reminders_read_created", "is_read", "created_at"),
+    )
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+    
+    name = Column(String, primary_key=True)  # Background job name
+    last_run_date = Column(String)  # YYYY-MM-DD watermark of the last claimed run
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    rows_produced = Column(Integer, default=0)
+    status = Column(String)  # running, success, failed
+    error = Column(Text)
+    report = Column(Text)  # JSON details of the last run, for jobs that produce one
+
+class ResourceVersion(Base):
+    __tablename__ = "resource_versions"
+    
+    resource = Column(String, primary_key=True)  # "assignments", "exams", "subjects", "plans"
+    version = Column(Integer, nullable=False, default=0)  # Bumped in the same transaction as each write
 
 def init_db():
+    # Takes effect only on a new, empty database; existing ones are converted by migrate_db.py
+    migrate_auto_vacuum(convert_existing=False)
     Base.metadata.create_all(bind=engine)
+    migrate_resource_versions()
     # Migrate existing tables if needed
     migrate_subjects_table()
+    migrate_exams_table()
+    migrate_job_runs_table()
     migrate_study_plans_table()
+    migrate_notifications_table()
+    migrate_item_dates()
+    migrate_indexes()
+
+def migrate_resource_versions():
+    """
+    Seed one counter row per cached resource. Counters start at the current time in
+    milliseconds, so a recreated database never reissues an ETag a client still holds.
+    """
+    import time
+    from app.models.resource_versions import RESOURCES
+    
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT OR IGNORE INTO resource_versions (resource, version) VALUES (:resource, :version)"),
+                [{"resource": resource, "version": int(time.time() * 1000)} for resource in RESOURCES]
+            )
+    except Exception as e:
+        print(f"Error seeding resource versions: {e}")
 
 def migrate_subjects_table():
     """Add new columns to subjects table if they don't exist"""
@@ -122,6 +202,78 @@ def migrate_subjects_table():
     except Exception as e:
         print(f"Error during migration: {e}")
 
+def migrate_exams_table():
+    """Add new columns to exams table if they don't exist"""
+    from sqlalchemy import inspect
+    
+    try:
+        inspector = inspect(engine)
+        
+        if 'exams' not in inspector.get_table_names():
+            return
+        
+        columns = [col['name'] for col in inspector.get_columns('exams')]
+        
+        with engine.begin() as conn:
+            # Add actual_hours column if it doesn't exist
+            if 'actual_hours' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE exams ADD COLUMN actual_hours FLOAT"))
+                    print("Added actual_hours column to exams table")
+                except Exception as e:
+                    print(f"Error adding actual_hours column: {e}")
+            
+            # Add feedback_features column if it doesn't exist
+            if 'feedback_features' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE exams ADD COLUMN feedback_features VARCHAR"))
+                    print("Added feedback_features column to exams table")
+                except Exception as e:
+                    print(f"Error adding feedback_features column: {e}")
+    except Exception as e:
+        print(f"Error during exams migration: {e}")
+
+def migrate_job_runs_table():
+    """Add new columns to job_runs table if they don't exist"""
+    from sqlalchemy import inspect
+    
+    try:
+        inspector = inspect(engine)
+        
+        if 'job_runs' not in inspector.get_table_names():
+            return
+        
+        columns = [col['name'] for col in inspector.get_columns('job_runs')]
+        
+        with engine.begin() as conn:
+            # Add report column if it doesn't exist
+            if 'report' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE job_runs ADD COLUMN report TEXT"))
+                    print("Added report column to job_runs table")
+                except Exception as e:
+                    print(f"Error adding report column: {e}")
+    except Exception as e:
+        print(f"Error during job_runs migration: {e}")
+
+def migrate_auto_vacuum(convert_existing: bool = True):
+    """
+    Switch the database to incremental auto_vacuum, so the retention job can hand
+    free pages back a batch at a time. A database that already has tables needs one
+    full VACUUM for the switch, which locks and rewrites the whole file: that only
+    happens with convert_existing, from migrate_db.py, with the API stopped.
+    """
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:  # 2 = INCREMENTAL
+                return
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            if convert_existing:
+                conn.execute(text("VACUUM"))
+                print("Converted database to incremental auto_vacuum")
+    except Exception as e:
+        print(f"Error switching to incremental auto_vacuum: {e}")
+
 def migrate_study_plans_table():
     """Add new columns to study_plans table if they don't exist"""
     from sqlalchemy import inspect, text
@@ -199,9 +351,179 @@ def migrate_study_plans_table():
                     print("Added date column to study_plans table")
                 except Exception as e:
                     print(f"Error adding date column: {e}")
+            
+            # Add version_id column if it doesn't exist
+            if 'version_id' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE study_plans ADD COLUMN version_id INTEGER"))
+                    print("Added version_id column to study_plans table")
+                except Exception as e:
+                    print(f"Error adding version_id column: {e}")
+            
+            # Add retired_version_id column if it doesn't exist. Versions written
+            # before it are full copies, so each row belongs to its own version only.
+            if 'retired_version_id' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE study_plans ADD COLUMN retired_version_id INTEGER"))
+                    conn.execute(text(
+                        "UPDATE study_plans SET retired_version_id = version_id + 1 "
+                        "WHERE version_id < (SELECT MAX(id) FROM plan_versions)"
+                    ))
+                    print("Added retired_version_id column to study_plans table")
+                except Exception as e:
+                    print(f"Error adding retired_version_id column: {e}")
+            
+            # Add subject_name column if it doesn't exist
+            if 'subject_name' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE study_plans ADD COLUMN subject_name VARCHAR"))
+                    print("Added subject_name column to study_plans table")
+                except Exception as e:
+                    print(f"Error adding subject_name column: {e}")
     except Exception as e:
         print(f"Error during study_plans migration: {e}")
 
+def migrate_notifications_table():
+    """Add and backfill the notifications dedup_key and item key columns, and the dedup unique index"""
+    from sqlalchemy import inspect
+    from app.models.notification import notification_dedup_key, notification_item_keys
+    
+    try:
+        inspector = inspect(engine)
+        
+        # Check if notifications table exists
+        if 'notifications' not in inspector.get_table_names():
+            return
+        
+        columns = [col['name'] for col in inspector.get_columns('notifications')]
+        
+        with engine.begin() as conn:
+            # Add dedup_key column if it doesn't exist
+            if 'dedup_key' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE notifications ADD COLUMN dedup_key VARCHAR"))
+                    print("Added dedup_key column to notifications table")
+                except Exception as e:
+                    print(f"Error adding dedup_key column: {e}")
+            
+            # Backfill keys for rows written before the column existed
+            rows = conn.execute(text(
+                "SELECT id, type, item_ids, message FROM notifications WHERE dedup_key IS NULL"
+            )).fetchall()
+            if rows:
+                conn.execute(
+                    text("UPDATE notifications SET dedup_key = :dedup_key WHERE id = :id"),
+                    [
+                        {"id": row.id, "dedup_key": notification_dedup_key({"type": row.type, "item_ids": row.item_ids, "message": row.message})}
+                        for row in rows
+                    ]
+                )
+                print(f"Backfilled dedup_key for {len(rows)} notifications")
+            
+            # Add and backfill the item key columns
+            for column in ("first_item_key", "second_item_key"):
+                if column not in columns:
+                    try:
+                        conn.execute(text(f"ALTER TABLE notifications ADD COLUMN {column} VARCHAR"))
+                        print(f"Added {column} column to notifications table")
+                    except Exception as e:
+                        print(f"Error adding {column} column: {e}")
+            if 'first_item_key' not in columns:
+                rows = conn.execute(text(
+                    "SELECT id, item_type, item_ids FROM notifications WHERE item_ids IS NOT NULL"
+                )).fetchall()
+                updates = []
+                for row in rows:
+                    first_key, second_key = notification_item_keys({"item_type": row.item_type, "item_ids": row.item_ids})
+                    if first_key:
+                        updates.append({"id": row.id, "first_key": first_key, "second_key": second_key})
+                if updates:
+                    conn.execute(
+                        text("UPDATE notifications SET first_item_key = :first_key, second_item_key = :second_key WHERE id = :id"),
+                        updates
+                    )
+                    print(f"Backfilled item keys for {len(updates)} notifications")
+        
+    except Exception as e:
+        print(f"Error during notifications migration: {e}")
+        return
+    
+    with engine.begin() as conn:
+        # Existing data may already hold duplicate unread rows; keep the newest of each
+        duplicates = conn.execute(text(
+            "UPDATE notifications SET is_read = 1 "
+            "WHERE is_read = 0 AND dedup_key IS NOT NULL AND id NOT IN ("
+            "SELECT MAX(id) FROM notifications WHERE is_read = 0 AND dedup_key IS NOT NULL GROUP BY dedup_key)"
+        )).rowcount
+        if duplicates:
+            print(f"Marked {duplicates} duplicate unread notifications as read")
+        try:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_notifications_dedup_unread "
+                "ON notifications (dedup_key) WHERE is_read = 0"
+            ))
+        except Exception as e:
+            # Without this index notifications are no longer deduplicated; do not start silently
+            print(f"ERROR: Could not create notifications dedup index: {e}")
+            raise
+
+def migrate_item_dates():
+    """Rewrite parseable but non-canonical dates (e.g. 2024-1-5) as zero-padded YYYY-MM-DD"""
+    from sqlalchemy import inspect
+    from app.utils.date_utils import normalize_date
+    
+    try:
+        tables = inspect(engine).get_table_names()
+        with engine.begin() as conn:
+            for table, column in (("assignments", "due_date"), ("exams", "exam_date")):
+                if table not in tables:
+                    continue
+                rows = conn.execute(text(
+                    f"SELECT id, {column} FROM {table} WHERE {column} IS NOT NULL AND "
+                    f"(length({column}) != 10 OR substr({column}, 5, 1) != '-' OR substr({column}, 8, 1) != '-')"
+                )).fetchall()
+                updates = [
+                    {"id": row_id, "value": normalize_date(value)}
+                    for row_id, value in rows if normalize_date(value) != value
+                ]
+                if updates:
+                    conn.execute(text(f"UPDATE {table} SET {column} = :value WHERE id = :id"), updates)
+                    print(f"Normalized {len(updates)} dates in {table}.{column}")
+    except Exception as e:
+        print(f"Error normalizing item dates: {e}")
+
+def migrate_indexes():
+    """Create indexes that create_all does not add to tables that already exist"""
+    from sqlalchemy import inspect
+    
+    indexes = [
+        ("ix_assignments_due_date", "assignments", "due_date"),
+        ("ix_exams_exam_date", "exams", "exam_date"),
+        ("ix_reminders_reminder_date", "reminders", "reminder_date"),
+        ("ix_study_plans_version_id", "study_plans", "version_id"),
+        ("ix_study_plans_retired_version_id", "study_plans", "retired_version_id"),
+        ("ix_study_plans_date", "study_plans", "date"),
+        ("ix_notifications_read_created", "notifications", "is_read, created_at, id"),
+        ("ix_reminders_read_created", "reminders", "is_read, created_at"),
+        ("ix_notifications_first_item_key", "notifications", "first_item_key"),
+        ("ix_notifications_second_item_key", "notifications", "second_item_key"),
+    ]
+    
+    try:
+        inspector = inspect(engine)
+        table_names = inspector.get_table_names()
+        
+        with engine.begin() as conn:
+            for index_name, table_name, columns in indexes:
+                if table_name not in table_names:
+                    continue
+                try:
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})"))
+                except Exception as e:
+                    print(f"Error creating index {index_name}: {e}")
+    except Exception as e:
+        print(f"Error during index migration: {e}")
+
 def get_db():
     db = SessionLocal()
     try:
@@ -1,9 +1,21 @@
+import json
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models.database import Exam
+from app.models import resource_versions
+from app.utils.date_utils import normalize_date
+
+def _normalize_dates(data: dict) -> dict:
+    # Clash detection range-scans the date column, which needs zero-padded dates
+    if data.get("exam_date"):
+        data = dict(data, exam_date=normalize_date(data["exam_date"]))
+    return data
 
 def create_exam(db: Session, exam_data: dict):
+    exam_data = _normalize_dates(exam_data)
     exam = Exam(**exam_data)
     db.add(exam)
+    resource_versions.bump(db, "exams")
     db.commit()
     db.refresh(exam)
     return exam
@@ -17,8 +29,9 @@ def get_all_exams(db: Session):
 def update_exam(db: Session, exam_id: int, exam_data: dict):
     exam = db.query(Exam).filter(Exam.id == exam_id).first()
     if exam:
-        for key, value in exam_data.items():
+        for key, value in _normalize_dates(exam_data).items():
             setattr(exam, key, value)
+        resource_versions.bump(db, "exams")
         db.commit()
         db.refresh(exam)
     return exam
@@ -27,7 +40,43 @@ def delete_exam(db: Session, exam_id: int):
     exam = db.query(Exam).filter(Exam.id == exam_id).first()
     if exam:
         db.delete(exam)
+        resource_versions.bump(db, "exams")
         db.commit()
     return exam
 
+def set_actual_hours(db: Session, exam_id: int, actual_hours: float, previous_hours: float = None, features=None):
+    """
+    Record actual hours only while the stored value still equals previous_hours, so
+    two concurrent submissions cannot both feed the same change to the model.
+    features is the feature vector the model absorbs with them, kept so that a later
+    correction removes exactly that observation even if the exam was edited.
+    Returns False when the exam is missing or its value changed in the meantime.
+    """
+    current = Exam.actual_hours.is_(None) if previous_hours is None else Exam.actual_hours == previous_hours
+    values = {"actual_hours": actual_hours}
+    if features is not None:
+        values["feedback_features"] = json.dumps([float(value) for value in features])
+    updated = db.query(Exam).filter(Exam.id == exam_id, current).update(values, synchronize_session=False)
+    if updated:
+        resource_versions.bump(db, "exams")
+    db.commit()
+    return bool(updated)
+
+def get_feedback_features(exam: Exam):
+    """The feature vector absorbed with the exam's actual hours, or None if not stored"""
+    return json.loads(exam.feedback_features) if exam.feedback_features else None
 
+def iter_feedback_rows(db: Session, batch_size: int = 10000):
+    """
+    Exams with reported actual hours as (exam_date, difficulty, past_score, chapters,
+    created_at, actual_hours, feedback_features) tuples, fetched from a streaming
+    cursor in lists of at most batch_size rows so the whole table is never held in
+    memory. feedback_features is the decoded stored vector, or None.
+    """
+    query = select(
+        Exam.exam_date, Exam.difficulty, Exam.past_score, Exam.chapters, Exam.created_at, Exam.actual_hours,
+        Exam.feedback_features
+    ).where(Exam.actual_hours.isnot(None)).order_by(Exam.id)
+    result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.partitions():
+        yield [tuple(row[:6]) + (json.loads(row[6]) if row[6] else None,) for row in partition]
@@ -1,7 +1,45 @@
+import hashlib
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app.models.database import Notification
 
+def notification_dedup_key(notification_data: dict) -> str:
+    """
+    Stable dedup key for a notification.
+    The message is part of the key so that a notification whose wording changes
+    (renamed item, moved date) is raised again, matching message-based dedup.
+    """
+    parts = [str(notification_data.get(field) or "") for field in ("type", "item_ids", "message")]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def notification_item_keys(notification_data: dict):
+    """
+    ("assignment:<id>" | "exam:<id>", ...) for the items a notification refers to.
+    item_ids is "<id>,<id>" for single-type pairs and "assignment:<id>,exam:<id>"
+    for mixed ones; missing keys are None.
+    """
+    item_type = notification_data.get("item_type")
+    keys = []
+    for part in str(notification_data.get("item_ids") or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            keys.append(part)
+        elif item_type in ("assignment", "exam"):
+            keys.append(f"{item_type}:{part}")
+    keys += [None, None]
+    return keys[0], keys[1]
+
+def _with_keys(notification_data: dict) -> dict:
+    row = dict(notification_data)
+    row.setdefault("dedup_key", notification_dedup_key(row))
+    row["first_item_key"], row["second_item_key"] = notification_item_keys(row)
+    return row
+
 def create_notification(db: Session, notification_data: dict):
+    notification_data = _with_keys(notification_data)
     notification = Notification(**notification_data)
     db.add(notification)
     db.commit()
@@ -15,7 +53,34 @@ def get_all_notifications(db: Session, unread_only: bool = False):
     query = db.query(Notification)
     if unread_only:
         query = query.filter(Notification.is_read == False)
-    return query.order_by(Notification.created_at.desc()).all()
+    return query.order_by(Notification.created_at.desc(), Notification.id.desc()).all()
+
+def get_notifications_page(db: Session, unread_only: bool = False, before=None, limit: int = 50):
+    """
+    Newest-first page of notifications using keyset pagination.
+    before is the (created_at, id) of the last notification of the previous page;
+    the (is_read, created_at, id) index serves both the filter and the order.
+    """
+    query = db.query(Notification)
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+    if before is not None:
+        created_at, notification_id = before
+        query = query.filter(or_(
+            Notification.created_at < created_at,
+            and_(Notification.created_at == created_at, Notification.id < notification_id)
+        ))
+    return query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit).all()
+
+def count_unread_notifications(db: Session) -> int:
+    return db.query(func.count(Notification.id)).filter(Notification.is_read == False).scalar()
+
+def get_notifications_after(db: Session, last_id: int, limit: int = 500):
+    """Notifications with an id above last_id, oldest first, via the primary key"""
+    return db.query(Notification).filter(Notification.id > last_id).order_by(Notification.id).limit(limit).all()
+
+def get_max_notification_id(db: Session) -> int:
+    return db.query(func.max(Notification.id)).scalar() or 0
 
 def mark_notification_read(db: Session, notification_id: int):
     notification = db.query(Notification).filter(Notification.id == notification_id).first()
@@ -37,4 +102,68 @@ def delete_notification(db: Session, notification_id: int):
         db.commit()
     return notification
 
+def bulk_create_notifications(db: Session, notifications_data: list):
+    """
+    Insert notifications that have no unread duplicate, in one transaction.
+    Existing unread keys are looked up in one batched query and the remaining rows
+    go through a single INSERT OR IGNORE executemany; the unique partial index on
+    dedup_key makes concurrent writers safe. Returns the notifications actually
+    inserted, with their ids.
+    """
+    rows = {}
+    for notification_data in notifications_data:
+        row = dict(notification_data)
+        row.setdefault("is_read", False)
+        row["dedup_key"] = notification_dedup_key(row)
+        row["first_item_key"], row["second_item_key"] = notification_item_keys(row)
+        rows.setdefault(row["dedup_key"], row)
+    if not rows:
+        return []
+    
+    keys = list(rows)
+    existing = set()
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        existing.update(
+            key for (key,) in db.query(Notification.dedup_key).filter(
+                Notification.dedup_key.in_(chunk),
+                Notification.is_read == False
+            )
+        )
+    new_rows = [row for key, row in rows.items() if key not in existing]
+    
+    created = []
+    try:
+        if new_rows:
+            # Rows dropped by the unique index (a concurrent writer got there first)
+            # return nothing, so only notifications actually inserted are reported
+            inserted = db.execute(
+                sqlite_insert(Notification.__table__).on_conflict_do_nothing()
+                .returning(Notification.__table__.c.id, Notification.__table__.c.dedup_key),
+                new_rows
+            )
+            created = [dict(rows[key], id=notification_id) for notification_id, key in inserted]
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error inserting notifications: {e}")
+        raise
+    return created
+
+def get_clash_notifications_for_item(db: Session, item_type: str, item_id: int):
+    """Clash notifications that reference the given assignment or exam, via the item key indexes"""
+    key = f"{item_type}:{item_id}"
+    return db.query(Notification).filter(
+        Notification.type == "clash",
+        or_(Notification.first_item_key == key, Notification.second_item_key == key)
+    ).all()
 
+def delete_notifications(db: Session, notification_ids: list):
+    """Delete several notifications in one statement"""
+    if not notification_ids:
+        return 0
+    deleted = db.query(Notification).filter(
+        Notification.id.in_(notification_ids)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
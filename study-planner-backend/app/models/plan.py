@@ -1,10 +1,57 @@
+import os
+from datetime import datetime
+from sqlalchemy import and_, exists, func, insert, literal, or_, select
 from sqlalchemy.orm import Session
-from app.models.database import StudyPlan
+from app.models.database import StudyPlan, PlanVersion, ActivePlan, Assignment, Exam
+from app.models import resource_versions
+
+# Plan versions kept for rollback and diffing, including the active one
+PLAN_VERSIONS_KEPT = int(os.environ.get("PLAN_VERSIONS_KEPT", "3"))
+
+def _visible_in(version):
+    """
+    Rows that belong to a plan version. A row is written once, by the version that
+    introduced it (version_id), and belongs to every later version until one that
+    replaces or drops it (retired_version_id), so versions only store their changes.
+    """
+    return and_(
+        StudyPlan.version_id <= version,
+        or_(StudyPlan.retired_version_id == None, StudyPlan.retired_version_id > version)
+    )
+
+def _active_plan_filter():
+    """
+    Rows of the active plan version, resolved inside the same statement so a read
+    never mixes two versions. Before any version exists, unversioned rows are used.
+    """
+    active_version = select(ActivePlan.version_id).where(ActivePlan.id == 1).scalar_subquery()
+    return or_(
+        _visible_in(active_version),
+        and_(StudyPlan.version_id == None, ~exists().where(ActivePlan.id == 1))
+    )
+
+def get_active_version_id(db: Session):
+    return db.query(ActivePlan.version_id).filter(ActivePlan.id == 1).scalar()
+
+def get_active_input_hash(db: Session):
+    """Plan cache key of the inputs behind the active version, shared by all workers"""
+    return db.query(PlanVersion.input_hash).join(
+        ActivePlan, ActivePlan.version_id == PlanVersion.id
+    ).filter(ActivePlan.id == 1).scalar()
+
+def _set_active_version(db: Session, version_id: int):
+    pointer = db.query(ActivePlan).filter(ActivePlan.id == 1).first()
+    if pointer is None:
+        db.add(ActivePlan(id=1, version_id=version_id))
+    else:
+        pointer.version_id = version_id
+        pointer.updated_at = datetime.utcnow()
 
 def create_study_plan(db: Session, plan_data: dict):
     try:
         plan = StudyPlan(**plan_data)
         db.add(plan)
+        resource_versions.bump(db, "plans")
         db.commit()
         db.refresh(plan)
         return plan
@@ -14,21 +61,270 @@ def create_study_plan(db: Session, plan_data: dict):
         print(f"Plan data: {plan_data}")
         raise
 
+def _retire_rows(db: Session, version_id: int, plan_ids: list):
+    """Drop rows from version_id onwards, in chunks that stay under SQLite's parameter limit"""
+    for start in range(0, len(plan_ids), 500):
+        db.query(StudyPlan).filter(StudyPlan.id.in_(plan_ids[start:start + 500])).update(
+            {"retired_version_id": version_id}, synchronize_session=False
+        )
+
+def _make_active_version_latest(db: Session):
+    """
+    New versions are written as changes to the latest one, so when an older version
+    is active (after a rollback) it is first restored as a new latest version: rows
+    added since are retired and rows it still had are re-added, a cost proportional
+    to the difference. Rows saved before versioning are adopted into a first version.
+    Returns the active PlanVersion, or None when there is no plan at all.
+    """
+    active_id = get_active_version_id(db)
+    if active_id is None:
+        legacy_rows = db.query(func.count(StudyPlan.id)).filter(StudyPlan.version_id == None).scalar()
+        if not legacy_rows:
+            return None
+        version = PlanVersion(slot_count=legacy_rows)
+        db.add(version)
+        db.flush()
+        db.query(StudyPlan).filter(StudyPlan.version_id == None).update(
+            {"version_id": version.id}, synchronize_session=False
+        )
+        _set_active_version(db, version.id)
+        db.flush()
+        return version
+    
+    active = db.query(PlanVersion).filter(PlanVersion.id == active_id).first()
+    latest_id = db.query(func.max(PlanVersion.id)).scalar()
+    if active_id == latest_id:
+        return active
+    
+    version = PlanVersion(input_hash=active.input_hash, slot_count=active.slot_count)
+    db.add(version)
+    db.flush()
+    db.query(StudyPlan).filter(
+        StudyPlan.retired_version_id == None, StudyPlan.version_id > active_id
+    ).update({"retired_version_id": version.id}, synchronize_session=False)
+    columns = [column.name for column in StudyPlan.__table__.columns if column.name not in ("id", "version_id", "retired_version_id")]
+    restored_rows = select(
+        *[StudyPlan.__table__.c[name] for name in columns], literal(version.id)
+    ).where(_visible_in(active_id), StudyPlan.retired_version_id != None)
+    db.execute(insert(StudyPlan).from_select(columns + ["version_id"], restored_rows))
+    _set_active_version(db, version.id)
+    db.flush()
+    return version
+
+def save_plan_version(db: Session, plan_rows: list, input_hash: str = None):
+    """
+    Write plan_rows as a new plan version and make it the active one.
+    The rows are inserted with one executemany, the previous version's rows are
+    retired, and the pointer row is flipped in the same transaction, so readers see
+    either the previous plan or the complete new one. On failure everything is
+    rolled back and the previous plan stays active.
+    """
+    try:
+        version = PlanVersion(input_hash=input_hash, slot_count=len(plan_rows))
+        db.add(version)
+        db.flush()
+        db.query(StudyPlan).filter(
+            StudyPlan.retired_version_id == None, StudyPlan.version_id != None
+        ).update({"retired_version_id": version.id}, synchronize_session=False)
+        if plan_rows:
+            db.execute(insert(StudyPlan), [dict(row, version_id=version.id) for row in plan_rows])
+        _set_active_version(db, version.id)
+        resource_versions.bump(db, "plans")
+        db.commit()
+        return version
+    except Exception as e:
+        db.rollback()
+        print(f"Error saving study plan version: {e}")
+        raise
+
+def get_subject_names(db: Session, plans):
+    """
+    Subject name for each plan row, keyed by (item_type, item_id). Rows saved before
+    subject_name was stored are resolved with one query per item type.
+    """
+    subject_names = {}
+    missing = {"assignment": set(), "exam": set()}
+    for plan in plans:
+        key = (plan.item_type, plan.item_id)
+        if plan.subject_name:
+            subject_names[key] = plan.subject_name
+        elif plan.item_type in missing:
+            missing[plan.item_type].add(plan.item_id)
+    
+    if missing["assignment"]:
+        rows = db.query(Assignment.id, Assignment.subject_name).filter(Assignment.id.in_(missing["assignment"]))
+        subject_names.update({("assignment", item_id): name for item_id, name in rows})
+    if missing["exam"]:
+        rows = db.query(Exam.id, Exam.subject_name).filter(Exam.id.in_(missing["exam"]))
+        subject_names.update({("exam", item_id): name for item_id, name in rows})
+    return subject_names
+
+def get_plan_versions(db: Session):
+    return db.query(PlanVersion).order_by(PlanVersion.id.desc()).all()
+
+def activate_plan_version(db: Session, version_id: int):
+    """Point readers at an earlier plan version (rollback)"""
+    version = db.query(PlanVersion).filter(PlanVersion.id == version_id).first()
+    if version:
+        _set_active_version(db, version.id)
+        resource_versions.bump(db, "plans")
+        db.commit()
+    return version
+
+def delete_old_plan_versions(db: Session, keep: int = PLAN_VERSIONS_KEPT):
+    """
+    Garbage-collect plan versions beyond the newest `keep` ones (the active version
+    is always kept), the retired rows no kept version still contains, and
+    unversioned rows once a version is active. Returns the number of plan rows deleted.
+    """
+    active_id = get_active_version_id(db)
+    kept = {version_id for (version_id,) in db.query(PlanVersion.id).order_by(PlanVersion.id.desc()).limit(keep)}
+    if active_id is not None:
+        kept.add(active_id)
+    old_ids = [version_id for (version_id,) in db.query(PlanVersion.id) if version_id not in kept]
+    
+    deleted = 0
+    if old_ids:
+        db.query(PlanVersion).filter(PlanVersion.id.in_(old_ids)).delete(synchronize_session=False)
+    if kept:
+        deleted += db.query(StudyPlan).filter(
+            StudyPlan.retired_version_id != None,
+            ~or_(*[_visible_in(version_id) for version_id in kept])
+        ).delete(synchronize_session=False)
+    if active_id is not None:
+        deleted += db.query(StudyPlan).filter(StudyPlan.version_id == None).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
 def get_study_plans(db: Session):
-    return db.query(StudyPlan).all()
+    return db.query(StudyPlan).filter(_active_plan_filter()).all()
+
+def get_study_plans_page(db: Session, from_date: str = None, to_date: str = None, after: str = None, max_days: int = None):
+    """
+    Dated rows of the active plan between from_date and to_date (inclusive) and
+    after the `after` cursor date, ordered by date, served from the date index.
+    With max_days, only the first max_days dates are returned. Returns
+    (plans, next_cursor); next_cursor is the last date returned when more follow.
+    """
+    query = db.query(StudyPlan).filter(_active_plan_filter(), StudyPlan.date != None)
+    if from_date:
+        query = query.filter(StudyPlan.date >= from_date)
+    if to_date:
+        query = query.filter(StudyPlan.date <= to_date)
+    if after:
+        query = query.filter(StudyPlan.date > after)
+    
+    next_cursor = None
+    if max_days:
+        dates = [
+            plan_date for (plan_date,) in
+            query.with_entities(StudyPlan.date).distinct().order_by(StudyPlan.date).limit(max_days + 1)
+        ]
+        if len(dates) > max_days:
+            next_cursor = dates[max_days - 1]
+            query = query.filter(StudyPlan.date <= next_cursor)
+    
+    return query.order_by(StudyPlan.date, StudyPlan.id).all(), next_cursor
 
 def get_study_plans_by_day(db: Session, day: str):
-    return db.query(StudyPlan).filter(StudyPlan.day == day).all()
+    return db.query(StudyPlan).filter(_active_plan_filter(), StudyPlan.day == day).all()
 
 def delete_study_plan(db: Session, plan_id: int):
     plan = db.query(StudyPlan).filter(StudyPlan.id == plan_id).first()
     if plan:
         db.delete(plan)
+        resource_versions.bump(db, "plans")
         db.commit()
     return plan
 
 def clear_all_plans(db: Session):
     db.query(StudyPlan).delete()
+    db.query(PlanVersion).delete()
+    db.query(ActivePlan).delete()
+    resource_versions.bump(db, "plans")
     db.commit()
     return {"message": "All plans cleared"}
 
+
+def sync_study_plans(db: Session, plan_rows: list, from_date: str, input_hash: str = None):
+    """
+    Incrementally bring the plan for dates on or after from_date in line with
+    plan_rows. Rows are matched on (date, time_slot) against the active version;
+    earlier rows are left as they are. When anything changed, a new plan version is
+    written as a delta: only the replaced and removed rows are retired and only the
+    changed rows are inserted, and the pointer is flipped in the same transaction.
+    Unchanged rows are shared with the previous version, which is kept for rollback
+    and diffing.
+    """
+    try:
+        active = _make_active_version_latest(db)
+        active_id = active.id if active else None
+        compared_fields = ("item_id", "item_type", "item_name", "subject_name", "day", "hours", "category")
+        existing = {}
+        stale = []
+        query = db.query(StudyPlan).filter(
+            _active_plan_filter(),
+            or_(StudyPlan.date >= from_date, StudyPlan.date == None)
+        )
+        for plan in query.all():
+            key = (plan.date, plan.time_slot)
+            if not plan.date or key in existing:
+                stale.append(plan)  # Undated legacy rows or duplicates cannot be matched
+            else:
+                existing[key] = plan
+
+        changed_rows = []
+        replaced_ids = []
+        inserted = updated = deleted = 0
+        changed_dates = []
+        for plan_data in plan_rows:
+            key = (plan_data["date"], plan_data["time_slot"])
+            plan = existing.pop(key, None)
+            if plan is None:
+                changed_rows.append(plan_data)
+                inserted += 1
+                changed_dates.append(plan_data["date"])
+            elif any(getattr(plan, field) != plan_data[field] for field in compared_fields):
+                changed_rows.append(plan_data)
+                replaced_ids.append(plan.id)
+                updated += 1
+                changed_dates.append(plan_data["date"])
+
+        for plan in stale + list(existing.values()):
+            replaced_ids.append(plan.id)
+            deleted += 1
+            if plan.date:
+                changed_dates.append(plan.date)
+
+        version_id = active_id
+        if changed_dates:
+            version = PlanVersion(
+                input_hash=input_hash,
+                slot_count=(active.slot_count if active else 0) + inserted - deleted
+            )
+            db.add(version)
+            db.flush()
+            version_id = version.id
+            _retire_rows(db, version.id, replaced_ids)
+            if changed_rows:
+                db.execute(insert(StudyPlan), [dict(row, version_id=version.id) for row in changed_rows])
+            _set_active_version(db, version.id)
+            resource_versions.bump(db, "plans")
+        elif active is not None:
+            # Same plan content, produced from these inputs
+            active.input_hash = input_hash
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error syncing study plans: {e}")
+        raise
+
+    return {
+        "version_id": version_id,
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": deleted,
+        "unchanged": len(plan_rows) - inserted - updated,
+        "window_start": min(changed_dates) if changed_dates else None,
+        "window_end": max(changed_dates) if changed_dates else None
+    }
@@ -0,0 +1,34 @@
+"""
+Resource Version Counters
+Every model write function bumps the counter of the resource it changed, in the
+same transaction as the write. List endpoints derive their ETag from these
+counters, so conditional GETs are answered with one primary-key read instead of
+the list query.
+
+The counters live in the resource_versions table, so every API worker sees
+writes (and daily jobs) handled by any other worker.
+"""
+from sqlalchemy import text, update
+from sqlalchemy.orm import Session
+from app.models.database import engine, ResourceVersion
+
+RESOURCES = ("assignments", "exams", "subjects", "plans")
+
+def bump(db: Session, *resources):
+    """Record that the given resources changed; call before committing the write"""
+    db.execute(
+        update(ResourceVersion)
+        .where(ResourceVersion.resource.in_(resources))
+        .values(version=ResourceVersion.version + 1)
+    )
+
+def get_all_versions() -> dict:
+    with engine.connect() as conn:
+        return {resource: version for resource, version in conn.execute(
+            text("SELECT resource, version FROM resource_versions")
+        )}
+
+def get_etag(*resources) -> str:
+    """Strong ETag covering the current version of each resource"""
+    versions = get_all_versions()
+    return '"' + "-".join(str(versions.get(resource, 0)) for resource in resources) + '"'
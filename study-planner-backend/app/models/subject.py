@@ -1,10 +1,13 @@
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 from app.models.database import Subject, Reminder
+from app.models import resource_versions
 from datetime import datetime
 
 def create_subject(db: Session, subject_data: dict):
     subject = Subject(**subject_data)
     db.add(subject)
+    resource_versions.bump(db, "subjects")
     db.commit()
     db.refresh(subject)
     return subject
@@ -20,6 +23,7 @@ def update_subject(db: Session, subject_id: int, subject_data: dict):
     if subject:
         for key, value in subject_data.items():
             setattr(subject, key, value)
+        resource_versions.bump(db, "subjects")
         db.commit()
         db.refresh(subject)
     return subject
@@ -28,6 +32,7 @@ def delete_subject(db: Session, subject_id: int):
     subject = db.query(Subject).filter(Subject.id == subject_id).first()
     if subject:
         db.delete(subject)
+        resource_versions.bump(db, "subjects")
         db.commit()
     return subject
 
@@ -38,6 +43,26 @@ def create_reminder(db: Session, reminder_data: dict):
     db.refresh(reminder)
     return reminder
 
+def bulk_create_reminders(db: Session, reminders_data: list):
+    """Insert several reminders with one executemany and a single commit"""
+    if not reminders_data:
+        return 0
+    try:
+        db.execute(insert(Reminder.__table__), reminders_data)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error inserting reminders: {e}")
+        raise
+    return len(reminders_data)
+
+def get_reminders_after(db: Session, last_id: int, limit: int = 500):
+    """Reminders with an id above last_id, oldest first, via the primary key"""
+    return db.query(Reminder).filter(Reminder.id > last_id).order_by(Reminder.id).limit(limit).all()
+
+def get_max_reminder_id(db: Session) -> int:
+    return db.query(func.max(Reminder.id)).scalar() or 0
+
 def get_active_reminders(db: Session):
     return db.query(Reminder).filter(Reminder.is_read == False).all()
 
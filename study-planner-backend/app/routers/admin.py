@@ -1,6 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.models.database import get_db, Subject, Assignment, Exam, StudyPlan, Notification, Reminder
+from app.models.database import get_db, Subject, Assignment, Exam, StudyPlan, PlanVersion, ActivePlan, Notification, Reminder
+from app.models import resource_versions
+from app.services.response_cache import response_cache
+from app.services.work_queue import analysis_queue
+from app.services.daily_jobs import DAILY_JOBS, get_job_status, get_job_report, run_job
+from app.services import retention
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -10,11 +15,14 @@ def clear_all_data(db: Session = Depends(get_db)):
     try:
         # Clear all tables
         db.query(StudyPlan).delete()
+        db.query(PlanVersion).delete()
+        db.query(ActivePlan).delete()
         db.query(Notification).delete()
         db.query(Reminder).delete()
         db.query(Assignment).delete()
         db.query(Exam).delete()
         db.query(Subject).delete()
+        resource_versions.bump(db, *resource_versions.RESOURCES)
         db.commit()
         return {
             "message": "All data cleared successfully",
@@ -31,3 +39,32 @@ def clear_all_data(db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error clearing data: {str(e)}")
 
+@router.get("/queue")
+def get_queue_status():
+    """Background analysis queue depth, lag and run statistics"""
+    return analysis_queue.status()
+
+@router.get("/response-cache")
+def get_response_cache_status():
+    """ETag response cache hits, 304s and current resource versions"""
+    return response_cache.stats()
+
+@router.get("/retention")
+def get_retention_status(db: Session = Depends(get_db)):
+    """Retention TTLs and the report of the last compaction run, from any worker"""
+    return {
+        "policy": retention.get_retention_policy(),
+        "last_report": get_job_report(db, "retention")
+    }
+
+@router.get("/jobs")
+def get_jobs_status(db: Session = Depends(get_db)):
+    """Last run, duration and rows produced for each daily background job"""
+    return get_job_status(db)
+
+@router.post("/jobs/{job_name}/run")
+def run_job_now(job_name: str):
+    """Run a daily job immediately, even if it already ran today"""
+    if job_name not in DAILY_JOBS:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return run_job(job_name, force=True)
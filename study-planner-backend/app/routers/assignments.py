@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
 from app.models.database import get_db
 from app.models import assignment as assignment_model
 from app.schemas import assignment_schema
-from app.services.clash_detector import detect_all_clashes
-from app.services.reminder_service import generate_automatic_reminders
+from app.services.work_queue import analysis_queue
+from app.services.response_cache import conditional_response
 from app.utils.date_utils import get_days_until_exam
+from app.utils.priority_utils import priority_for_days_left
 
 router = APIRouter(prefix="/api/assignments", tags=["assignments"])
 
@@ -15,31 +16,25 @@ def create_assignment(assignment: assignment_schema.AssignmentCreate, db: Sessio
     """Create a new assignment"""
     # Set priority based on due date
     days_left = get_days_until_exam(assignment.due_date)
-    if days_left <= 3:
-        priority = "urgent"
-    elif days_left <= 7:
-        priority = "high"
-    elif days_left > 30:
-        priority = "low"
-    else:
-        priority = "medium"
+    priority = priority_for_days_left(days_left)
     
     assignment_data = assignment.dict()
     assignment_data["priority"] = priority
     
     created_assignment = assignment_model.create_assignment(db, assignment_data)
     
-    # Detect clashes and generate reminders after creating
-    detect_all_clashes(db)
-    generate_automatic_reminders(db)
+    # Detect clashes and generate reminders in the background
+    analysis_queue.enqueue("assignment", created_assignment.id, reminders=True)
     
     return created_assignment
 
 @router.get("/", response_model=List[assignment_schema.AssignmentResponse])
-def get_assignments(db: Session = Depends(get_db)):
-    """Get all assignments"""
-    assignments = assignment_model.get_all_assignments(db)
-    return assignments
+def get_assignments(request: Request, db: Session = Depends(get_db)):
+    """Get all assignments (supports If-None-Match)"""
+    def build():
+        assignments = assignment_model.get_all_assignments(db)
+        return [assignment_schema.AssignmentResponse.model_validate(a) for a in assignments], {}
+    return conditional_response(request, ("assignments",), build)
 
 @router.get("/{assignment_id}", response_model=assignment_schema.AssignmentResponse)
 def get_assignment(assignment_id: int, db: Session = Depends(get_db)):
@@ -54,14 +49,7 @@ def update_assignment(assignment_id: int, assignment: assignment_schema.Assignme
     """Update an assignment"""
     # Recalculate priority
     days_left = get_days_until_exam(assignment.due_date)
-    if days_left <= 3:
-        priority = "urgent"
-    elif days_left <= 7:
-        priority = "high"
-    elif days_left > 30:
-        priority = "low"
-    else:
-        priority = "medium"
+    priority = priority_for_days_left(days_left)
     
     assignment_data = assignment.dict()
     assignment_data["priority"] = priority
@@ -70,8 +58,8 @@ def update_assignment(assignment_id: int, assignment: assignment_schema.Assignme
     if not updated_assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
-    # Detect clashes after updating
-    detect_all_clashes(db)
+    # Detect clashes in the background
+    analysis_queue.enqueue("assignment", assignment_id)
     
     return updated_assignment
 
@@ -82,8 +70,8 @@ def delete_assignment(assignment_id: int, db: Session = Depends(get_db)):
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
-    # Detect clashes after deleting
-    detect_all_clashes(db)
+    # Retire clashes involving the deleted assignment in the background
+    analysis_queue.enqueue("assignment", assignment_id)
     
     return {"message": "Assignment deleted successfully"}
 
@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
 from app.models.database import get_db
 from app.models import exam as exam_model
 from app.schemas import exam_schema
-from app.services.ml_model import predict_hours
-from app.services.clash_detector import detect_all_clashes
-from app.services.reminder_service import generate_automatic_reminders
-from app.utils.date_utils import get_days_until_exam
+from app.services.ml_model import predict_hours, update_model_with_feedback, feedback_features, get_model
+from app.services.work_queue import analysis_queue
+from app.services.response_cache import conditional_response
+from app.utils.date_utils import get_days_until_exam, get_days_left_at
+from app.utils.priority_utils import priority_for_days_left
 
 router = APIRouter(prefix="/api/exams", tags=["exams"])
 
@@ -24,14 +25,7 @@ def create_exam(exam: exam_schema.ExamCreate, db: Session = Depends(get_db)):
     )
     
     # Set priority
-    if days_left <= 3:
-        priority = "urgent"
-    elif days_left <= 7:
-        priority = "high"
-    elif days_left > 30:
-        priority = "low"
-    else:
-        priority = "medium"
+    priority = priority_for_days_left(days_left)
     
     exam_data = exam.dict()
     exam_data["recommended_hours"] = recommended_hours
@@ -39,17 +33,18 @@ def create_exam(exam: exam_schema.ExamCreate, db: Session = Depends(get_db)):
     
     created_exam = exam_model.create_exam(db, exam_data)
     
-    # Detect clashes and generate reminders after creating
-    detect_all_clashes(db)
-    generate_automatic_reminders(db)
+    # Detect clashes and generate reminders in the background
+    analysis_queue.enqueue("exam", created_exam.id, reminders=True)
     
     return created_exam
 
 @router.get("/", response_model=List[exam_schema.ExamResponse])
-def get_exams(db: Session = Depends(get_db)):
-    """Get all exams"""
-    exams = exam_model.get_all_exams(db)
-    return exams
+def get_exams(request: Request, db: Session = Depends(get_db)):
+    """Get all exams (supports If-None-Match)"""
+    def build():
+        exams = exam_model.get_all_exams(db)
+        return [exam_schema.ExamResponse.model_validate(e) for e in exams], {}
+    return conditional_response(request, ("exams",), build)
 
 @router.get("/{exam_id}", response_model=exam_schema.ExamResponse)
 def get_exam(exam_id: int, db: Session = Depends(get_db)):
@@ -72,14 +67,7 @@ def update_exam(exam_id: int, exam: exam_schema.ExamCreate, db: Session = Depend
     )
     
     # Recalculate priority
-    if days_left <= 3:
-        priority = "urgent"
-    elif days_left <= 7:
-        priority = "high"
-    elif days_left > 30:
-        priority = "low"
-    else:
-        priority = "medium"
+    priority = priority_for_days_left(days_left)
     
     exam_data = exam.dict()
     exam_data["recommended_hours"] = recommended_hours
@@ -89,8 +77,8 @@ def update_exam(exam_id: int, exam: exam_schema.ExamCreate, db: Session = Depend
     if not updated_exam:
         raise HTTPException(status_code=404, detail="Exam not found")
     
-    # Detect clashes after updating
-    detect_all_clashes(db)
+    # Detect clashes in the background
+    analysis_queue.enqueue("exam", exam_id)
     
     return updated_exam
 
@@ -101,9 +89,58 @@ def delete_exam(exam_id: int, db: Session = Depends(get_db)):
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
     
-    # Detect clashes after deleting
-    detect_all_clashes(db)
+    # Retire clashes involving the deleted exam in the background
+    analysis_queue.enqueue("exam", exam_id)
     
     return {"message": "Exam deleted successfully"}
 
-
+@router.post("/{exam_id}/actual-hours")
+def submit_actual_hours(exam_id: int, feedback: exam_schema.ExamFeedback, db: Session = Depends(get_db)):
+    """
+    Record the hours actually studied for an exam and feed them to the model.
+    Resubmitting the same value is a no-op; a corrected value replaces the earlier
+    observation in the model instead of being counted alongside it.
+    """
+    if feedback.actual_hours <= 0:
+        raise HTTPException(status_code=400, detail="Actual hours must be greater than 0")
+    
+    exam = exam_model.get_exam(db, exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    
+    # Fail with 503 before recording anything if there is no model to update yet
+    get_model()
+    
+    previous_hours = exam.actual_hours
+    # Exams recorded before features were stored fall back to their current ones
+    previous_features = exam_model.get_feedback_features(exam)
+    if previous_hours == feedback.actual_hours:
+        return {
+            "message": "Actual hours already recorded",
+            "exam_id": exam.id,
+            "actual_hours": exam.actual_hours,
+            "recommended_hours": exam.recommended_hours,
+            "prediction_error": None,
+            "model_updates": None
+        }
+    
+    features = feedback_features(
+        exam.past_score,
+        exam.difficulty,
+        exam.chapters,
+        get_days_left_at(exam.exam_date, exam.created_at)
+    )
+    if not exam_model.set_actual_hours(db, exam_id, feedback.actual_hours, previous_hours, features):
+        raise HTTPException(status_code=409, detail="Actual hours were changed by another request, please retry")
+    db.refresh(exam)
+    
+    result = update_model_with_feedback(features, feedback.actual_hours, previous_features, previous_hours)
+    
+    return {
+        "message": "Actual hours updated" if previous_hours is not None else "Actual hours recorded",
+        "exam_id": exam.id,
+        "actual_hours": exam.actual_hours,
+        "recommended_hours": exam.recommended_hours,
+        "prediction_error": round(result["prediction_error"], 4),
+        "model_updates": result["updates"]
+    }
@@ -1,13 +1,68 @@
-from fastapi import APIRouter
-from app.services.ml_model import train_model, predict_hours
+import csv
+import io
+import json
+import os
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from app.schemas import ml_schema
+from app.services import model_registry
+from app.services.ml_model import predict_hours, predict_hours_batch, model_holder, activate_model_version, DIFFICULTY_LEVELS
+from app.services.online_learner import online_learner
+from app.services.training_jobs import training_jobs
 
 router = APIRouter(prefix="/api/ml", tags=["ml"])
 
-@router.post("/train")
+# Largest batch accepted by /predict-batch, and rows scored per streamed chunk
+ML_BATCH_MAX_ROWS = int(os.environ.get("ML_BATCH_MAX_ROWS", "100000"))
+ML_BATCH_CHUNK_ROWS = 5000
+
+@router.post("/train", status_code=202)
 def train_ml_model():
-    """Train the ML model"""
-    result = train_model()
-    return {"message": result}
+    """
+    Start training the ML model in the background. Returns the job to poll at
+    /train/jobs/{job_id}; the new model version is activated when it succeeds.
+    """
+    job = training_jobs.submit()
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Could not start training: {job['error']}")
+    return {"message": "Model training started", **job}
+
+@router.get("/train/jobs")
+def get_training_jobs():
+    """Recent training jobs, newest first"""
+    return training_jobs.list()
+
+@router.get("/train/jobs/{job_id}")
+def get_training_job(job_id: str):
+    """Status of one training job"""
+    job = training_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@router.get("/versions")
+def get_model_versions():
+    """Stored model versions, newest first, with training time and row counts"""
+    return model_registry.list_versions()
+
+@router.post("/versions/{version}/activate")
+def activate_model(version: int):
+    """Roll back (or forward) to a stored model version after verifying its checksum"""
+    try:
+        document = activate_model_version(version)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Model version not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "message": f"Model version {version} activated",
+        "model_version": document["model_version"],
+        "trained_at": document.get("trained_at"),
+        "training_rows": document.get("training_rows")
+    }
 
 @router.post("/predict")
 def predict_study_hours(past_score: float, difficulty: str, chapters: int, days_left: int):
@@ -23,3 +78,95 @@ def predict_study_hours(past_score: float, difficulty: str, chapters: int, days_
         }
     }
 
+def _columns_from_json(body: bytes):
+    try:
+        batch = ml_schema.PredictBatchRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    return (
+        [row.past_score for row in batch.rows],
+        [DIFFICULTY_LEVELS.get(row.difficulty.lower(), 1) for row in batch.rows],
+        [row.chapters for row in batch.rows],
+        [row.days_left for row in batch.rows]
+    )
+
+def _columns_from_csv(body: bytes):
+    """
+    CSV with a header row: past_score, chapters, days_left and either difficulty
+    (easy/medium/hard) or difficulty_level (0/1/2), as in the training data.
+    """
+    reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+    fields = set(reader.fieldnames or [])
+    missing = {"past_score", "chapters", "days_left"} - fields
+    if missing or not fields & {"difficulty", "difficulty_level"}:
+        raise HTTPException(
+            status_code=400,
+            detail="CSV needs past_score, difficulty (or difficulty_level), chapters and days_left columns"
+        )
+    
+    past_scores, difficulty_levels, chapters, days_left = [], [], [], []
+    for line_number, row in enumerate(reader, start=2):
+        try:
+            past_scores.append(float(row["past_score"]))
+            difficulty = (row.get("difficulty") or "").strip()
+            if difficulty:
+                difficulty_levels.append(DIFFICULTY_LEVELS.get(difficulty.lower(), 1))
+            else:
+                level = row.get("difficulty_level")
+                if not level:
+                    raise ValueError("difficulty or difficulty_level is required")
+                if float(level) not in (0, 1, 2):
+                    raise ValueError(f"difficulty_level must be 0, 1 or 2, got {level!r}")
+                difficulty_levels.append(int(float(level)))
+            chapters.append(int(row["chapters"]))
+            days_left.append(int(row["days_left"]))
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid value on CSV line {line_number}: {e}")
+    return past_scores, difficulty_levels, chapters, days_left
+
+def _stream_predictions(columns, as_csv: bool):
+    """Score and emit the batch ML_BATCH_CHUNK_ROWS rows at a time"""
+    if as_csv:
+        yield "index,predicted_hours\n"
+    total = len(columns[0])
+    for start in range(0, total, ML_BATCH_CHUNK_ROWS):
+        chunk = [column[start:start + ML_BATCH_CHUNK_ROWS] for column in columns]
+        predictions = predict_hours_batch(*chunk)
+        if as_csv:
+            yield "".join(f"{start + offset},{hours}\n" for offset, hours in enumerate(predictions))
+        else:
+            yield "".join(
+                json.dumps({"index": start + offset, "predicted_hours": hours}) + "\n"
+                for offset, hours in enumerate(predictions)
+            )
+
+@router.post("/predict-batch")
+async def predict_study_hours_batch(request: Request, stream: bool = False):
+    """
+    Predict recommended study hours for many rows in one vectorized pass.
+    Send JSON ({"rows": [{past_score, difficulty, chapters, days_left}, ...]}) or
+    CSV (Content-Type: text/csv). Predictions are returned in input order; with
+    stream=true they are streamed as NDJSON (or CSV for CSV input).
+    """
+    body = await request.body()
+    as_csv = "csv" in request.headers.get("content-type", "")
+    parse = _columns_from_csv if as_csv else _columns_from_json
+    columns = await run_in_threadpool(parse, body)
+    
+    count = len(columns[0])
+    if count > ML_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {ML_BATCH_MAX_ROWS} rows per batch")
+    
+    if stream:
+        return StreamingResponse(
+            _stream_predictions(columns, as_csv),
+            media_type="text/csv" if as_csv else "application/x-ndjson"
+        )
+    
+    predictions = await run_in_threadpool(predict_hours_batch, *columns) if count else []
+    return {"count": count, "predictions": predictions}
+
+@router.get("/model")
+def get_model_status():
+    """Coefficients of the resident model, reload count and online learning state"""
+    return {**model_holder.stats(), "online": online_learner.stats()}
@@ -1,24 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from app.models.database import get_db
+from typing import List, Optional
+from app.models.database import get_db, SessionLocal
 from app.models import notification as notification_model
 from app.schemas import notification_schema
 from app.services.clash_detector import detect_all_clashes
+from app.services.event_bus import event_bus
+
+# Comment line sent on idle streams so proxies keep the connection open
+STREAM_KEEPALIVE_SECONDS = 15
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
+def _parse_cursor(cursor: str):
+    """Parse a "<created_at>,<id>" pagination cursor"""
+    try:
+        created_at, notification_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except (AttributeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid 'before' cursor, expected <created_at>,<id>")
+
 @router.get("/", response_model=List[notification_schema.NotificationResponse])
-def get_notifications(unread_only: bool = False, db: Session = Depends(get_db)):
-    """Get all notifications"""
-    notifications = notification_model.get_all_notifications(db, unread_only=unread_only)
+def get_notifications(
+    response: Response,
+    unread_only: bool = False,
+    before: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Get notifications, newest first.
+    With limit (and before, taken from the X-Next-Cursor header of the previous
+    page) results are paginated; without them every notification is returned.
+    """
+    if limit is None and before is None:
+        return notification_model.get_all_notifications(db, unread_only=unread_only)
+    
+    limit = limit or 50
+    cursor = _parse_cursor(before) if before is not None else None
+    notifications = notification_model.get_notifications_page(db, unread_only=unread_only, before=cursor, limit=limit)
+    if len(notifications) == limit:
+        last = notifications[-1]
+        response.headers["X-Next-Cursor"] = f"{last.created_at.isoformat()},{last.id}"
     return notifications
 
+def _format_event(event) -> str:
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+def _current_unread_count():
+    db = SessionLocal()
+    try:
+        return notification_model.count_unread_notifications(db)
+    finally:
+        db.close()
+
+@router.get("/stream")
+async def stream_notifications(request: Request):
+    """
+    Server-Sent Events stream of new notifications ("notification"), new
+    reminders ("reminder") and unread-count changes ("unread_count").
+    The current unread count is sent as soon as the client connects.
+    """
+    queue = event_bus.subscribe()
+    
+    async def events():
+        try:
+            count = await run_in_threadpool(_current_unread_count)
+            yield _format_event({"id": 0, "event": "unread_count", "data": {"count": count}})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _format_event(event)
+        finally:
+            event_bus.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stream/stats")
+def get_stream_stats():
+    """Connected stream clients and events published"""
+    return event_bus.stats()
+
 @router.get("/unread/count")
 def get_unread_count(db: Session = Depends(get_db)):
     """Get count of unread notifications"""
-    notifications = notification_model.get_all_notifications(db, unread_only=True)
-    return {"count": len(notifications)}
+    return {"count": notification_model.count_unread_notifications(db)}
 
 @router.post("/{notification_id}/read")
 def mark_notification_read(notification_id: int, db: Session = Depends(get_db)):
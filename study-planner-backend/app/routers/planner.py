@@ -1,23 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from app.models.database import get_db
+from app.models.database import get_db, SessionLocal
 from app.models import assignment as assignment_model, exam as exam_model, plan as plan_model
 from app.schemas import plan_schema
-from app.services.scheduler import generate_study_plan
+from app.services.scheduler import generate_study_plan, ALLOCATION_ENGINES
 from app.services.reminder_service import generate_automatic_reminders
 from app.services.clash_detector import detect_all_clashes
-from typing import List
+from app.services.plan_cache import plan_cache, compute_plan_key
+from app.services.response_cache import conditional_response
+from app.utils.date_utils import get_day_name, get_date_ordinal
+from typing import List, Optional
 
 router = APIRouter(prefix="/api/planner", tags=["planner"])
 
+def _build_plan_rows(plan_days):
+    """Flatten generated plan days into StudyPlan row dicts, skipping invalid slots"""
+    plan_rows = []
+    for day_idx, day_plan in enumerate(plan_days):
+        day_name = day_plan.get("day")
+        date_str = day_plan.get("date", "")
+        time_slots = day_plan.get("time_slots", [])
+        
+        # If day_name is missing, try to get it from date
+        if not day_name or day_name == "Unknown":
+            if date_str:
+                day_name = get_day_name(date_str)
+                if day_name == "Unknown":
+                    print(f"ERROR: Cannot determine day for date {date_str}")
+                    continue
+            else:
+                print(f"ERROR: No day or date for day_plan {day_idx}")
+                continue
+        
+        for slot_idx, slot in enumerate(time_slots):
+            if not slot.get("item_id"):
+                print(f"DEBUG: Skipping slot {slot_idx} - no item_id: {slot}")
+                continue  # Skip invalid slots
+            
+            plan_rows.append({
+                "item_id": slot["item_id"],
+                "item_type": slot["category"],
+                "item_name": slot.get("item_name", ""),
+                "subject_name": slot.get("subject_name", ""),
+                "day": day_name,  # Ensure day is set
+                "date": date_str,  # Store date for calendar views
+                "time_slot": slot.get("time", ""),
+                "hours": slot.get("hours", 0),
+                "category": slot["category"]
+            })
+    return plan_rows
+
+def _collect_old_plan_versions():
+    """Background task: drop plan versions that are no longer kept"""
+    db = SessionLocal()
+    try:
+        deleted = plan_model.delete_old_plan_versions(db)
+        print(f"DEBUG: Removed {deleted} slots from old plan versions")
+    except Exception as e:
+        print(f"Error collecting old plan versions: {e}")
+    finally:
+        db.close()
+
 @router.post("/generate", response_model=dict)
-def generate_plan(request: plan_schema.GeneratePlanRequest, db: Session = Depends(get_db)):
+def generate_plan(request: plan_schema.GeneratePlanRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Generate a study plan"""
     try:
         # Validate input
         if request.available_hours_per_day <= 0:
             raise HTTPException(status_code=400, detail="Available hours per day must be greater than 0")
         
+        if request.engine not in ALLOCATION_ENGINES:
+            raise HTTPException(status_code=400, detail=f"Unknown allocation engine '{request.engine}'")
+        
         # Get all assignments and exams
         assignments = assignment_model.get_all_assignments(db)
         exams = exam_model.get_all_exams(db)
@@ -64,98 +118,66 @@ def generate_plan(request: plan_schema.GeneratePlanRequest, db: Session = Depend
         if start_date >= end_date:
             raise HTTPException(status_code=400, detail="End date must be after start date")
         
-        # Generate plan
-        plan_result = generate_study_plan(
-            assignments,
-            exams,
-            request.available_hours_per_day,
-            start_date,
-            end_date
-        )
-        
-        # Clear existing plans
-        plan_model.clear_all_plans(db)
+        # Generate plan, reusing a cached one when the inputs are unchanged
+        cache_key = compute_plan_key(assignments, exams, request.available_hours_per_day, start_date, end_date)
+        plan_result = plan_cache.get(cache_key)
+        cache_hit = plan_result is not None
+        if not cache_hit:
+            plan_result = generate_study_plan(
+                assignments,
+                exams,
+                request.available_hours_per_day,
+                start_date,
+                end_date,
+                engine=request.engine
+            )
+            plan_cache.put(cache_key, plan_result)
         
-        # Save new plans to database
-        plans_saved = 0
-        print(f"DEBUG: Generated plan has {len(plan_result['plan'])} days")
+        plan_rows = _build_plan_rows(plan_result["plan"])
+        plan_changes = None
+        plan_up_to_date = plan_model.get_active_input_hash(db) == cache_key
         
-        # Use a transaction to ensure all plans are saved
-        try:
-            for day_idx, day_plan in enumerate(plan_result["plan"]):
-                day_name = day_plan.get("day")
-                date_str = day_plan.get("date", "")
-                time_slots = day_plan.get("time_slots", [])
-                
-                # If day_name is missing, try to get it from date
-                if not day_name or day_name == "Unknown":
-                    if date_str:
-                        from app.utils.date_utils import get_day_name
-                        day_name = get_day_name(date_str)
-                        if day_name == "Unknown":
-                            # Fallback: calculate from date
-                            try:
-                                from datetime import datetime
-                                date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                                day_name = date_obj.strftime("%A")
-                            except:
-                                print(f"ERROR: Cannot determine day for date {date_str}")
-                                continue
-                    else:
-                        print(f"ERROR: No day or date for day_plan {day_idx}")
-                        continue
-                
-                print(f"DEBUG: Day {day_idx} ({day_name}) has {len(time_slots)} time slots")
-                
-                if not time_slots:
-                    print(f"DEBUG: Skipping day {day_name} - no time slots")
-                    continue  # Skip days with no time slots
-                
-                for slot_idx, slot in enumerate(time_slots):
-                    try:
-                        if not slot.get("item_id"):
-                            print(f"DEBUG: Skipping slot {slot_idx} - no item_id: {slot}")
-                            continue  # Skip invalid slots
-                        
-                        plan_data = {
-                            "item_id": slot["item_id"],
-                            "item_type": slot["category"],
-                            "item_name": slot.get("item_name", ""),
-                            "day": day_name,  # Ensure day is set
-                            "date": date_str,  # Store date for calendar views
-                            "time_slot": slot.get("time", ""),
-                            "hours": slot.get("hours", 0),
-                            "category": slot["category"]
-                        }
-                        print(f"DEBUG: Saving plan slot: day={day_name}, item={plan_data['item_name']}, time={plan_data['time_slot']}")
-                        created_plan = plan_model.create_study_plan(db, plan_data)
-                        if created_plan:
-                            print(f"DEBUG: Plan saved with id={created_plan.id}, day={created_plan.day}")
-                            plans_saved += 1
-                        else:
-                            print(f"ERROR: Plan creation returned None")
-                    except Exception as e:
-                        print(f"Error saving plan slot: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        continue
-            
-            # Verify plans were saved
-            saved_plans = plan_model.get_study_plans(db)
-            print(f"DEBUG: Verification - {len(saved_plans)} plans now in database")
-            
-        except Exception as e:
-            db.rollback()
-            print(f"Error saving plans: {e}")
-            import traceback
-            traceback.print_exc()
-            raise HTTPException(status_code=500, detail=f"Error saving study plan: {str(e)}")
+        if plan_up_to_date:
+            # The active plan version was generated from these same inputs
+            plans_saved = 0
+            plan_cache.record_persist_skip()
+            print(f"DEBUG: Plan cache hit, stored plan is up to date")
+        elif request.incremental:
+            # Only rows from the plan start onwards that changed are written; the
+            # new version shares every other row with the previous one
+            try:
+                plan_changes = plan_model.sync_study_plans(db, plan_rows, start_date, input_hash=cache_key)
+            except Exception as e:
+                print(f"Error saving plans: {e}")
+                import traceback
+                traceback.print_exc()
+                raise HTTPException(status_code=500, detail=f"Error saving study plan: {str(e)}")
+            plans_saved = plan_changes["inserted"] + plan_changes["updated"]
+            background_tasks.add_task(_collect_old_plan_versions)
+            print(f"DEBUG: Incremental replan changed {plans_saved} slots, deleted {plan_changes['deleted']}")
+        else:
+            # Write the plan as a new version; readers keep seeing the previous
+            # version until the pointer flips
+            print(f"DEBUG: Generated plan has {len(plan_result['plan'])} days")
+            try:
+                version = plan_model.save_plan_version(db, plan_rows, input_hash=cache_key)
+            except Exception as e:
+                print(f"Error saving plans: {e}")
+                import traceback
+                traceback.print_exc()
+                raise HTTPException(status_code=500, detail=f"Error saving study plan: {str(e)}")
+            plans_saved = version.slot_count
+            background_tasks.add_task(_collect_old_plan_versions)
         
         print(f"DEBUG: Saved {plans_saved} plan slots to database")
         
-        # Detect clashes and generate automatic reminders after plan generation
-        detect_all_clashes(db)
-        reminders_created = generate_automatic_reminders(db)
+        # Detect clashes and generate automatic reminders after plan generation.
+        # When the stored plan came from these same inputs, both passes already ran
+        # for them (and item writes queue their own clash analysis), so they are skipped.
+        reminders_created = []
+        if not plan_up_to_date:
+            detect_all_clashes(db)
+            reminders_created = generate_automatic_reminders(db)
         
         # Extract clash rearrangements from rules_triggered
         clash_rearrangements = [r for r in plan_result["rules_triggered"] if "Clash detected" in r or "Conflict" in r]
@@ -168,6 +190,8 @@ def generate_plan(request: plan_schema.GeneratePlanRequest, db: Session = Depend
             "reminders_created": reminders_created,
             "total_hours_needed": plan_result["total_hours_needed"],
             "total_available_hours": plan_result["total_available_hours"],
+            "plan_changes": plan_changes,
+            "cache_hit": cache_hit,
             "message": "Study plan generated successfully with automatic clash detection and reminders"
         }
     except HTTPException:
@@ -184,105 +208,128 @@ def generate_plan(request: plan_schema.GeneratePlanRequest, db: Session = Depend
             detail=f"Error generating study plan: {str(e)}"
         )
 
-@router.get("/weekly", response_model=List[dict])
-def get_weekly_plan(db: Session = Depends(get_db)):
-    """Get weekly study plan"""
-    try:
+def _build_weekly_plan(db: Session, from_date, to_date, cursor, days):
+    """Group the stored plan rows into days; returns (days, response headers)"""
+    headers = {}
+    if from_date or to_date or cursor or days:
+        plans, next_cursor = plan_model.get_study_plans_page(db, from_date, to_date, cursor, days)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+    else:
         plans = plan_model.get_study_plans(db)
-        print(f"DEBUG: Found {len(plans)} plans in database")
+    print(f"DEBUG: Found {len(plans)} plans in database")
+    
+    if not plans:
+        print("DEBUG: No plans found in database")
+        return [], headers
+    
+    # Debug: Print first few plans
+    for i, p in enumerate(plans[:3]):
+        print(f"DEBUG: Plan {i}: day={p.day}, item_id={p.item_id}, item_type={p.item_type}, item_name={p.item_name}, time_slot={p.time_slot}")
+    
+    subject_names = plan_model.get_subject_names(db, plans)
+    
+    # Group by date (preferred) or day (fallback)
+    date_groups = {}  # Key: date string (YYYY-MM-DD) or day name
+    plans_with_day = 0
+    plans_without_day = 0
+    
+    for plan in plans:
+        day = plan.day
+        date = getattr(plan, 'date', None) if hasattr(plan, 'date') else None
         
-        if not plans:
-            print("DEBUG: No plans found in database")
-            return []
+        if not day or day.strip() == "":
+            plans_without_day += 1
+            print(f"DEBUG: Skipping plan with no day: id={plan.id}, item_id={plan.item_id}, item_type={plan.item_type}")
+            continue
+        plans_with_day += 1
         
-        # Debug: Print first few plans
-        for i, p in enumerate(plans[:3]):
-            print(f"DEBUG: Plan {i}: day={p.day}, item_id={p.item_id}, item_type={p.item_type}, item_name={p.item_name}, time_slot={p.time_slot}")
+        # Use date as key if available, otherwise use day
+        key = date if date else day
+        if key not in date_groups:
+            date_groups[key] = {
+                "day": day,
+                "date": date,
+                "time_slots": []
+            }
         
-        # Group by date (preferred) or day (fallback)
-        date_groups = {}  # Key: date string (YYYY-MM-DD) or day name
-        plans_with_day = 0
-        plans_without_day = 0
+        # Get item name (use stored name or fetch from database)
+        item_name = plan.item_name if plan.item_name else f"Item {plan.item_id}"
         
-        for plan in plans:
-            day = plan.day
-            date = getattr(plan, 'date', None) if hasattr(plan, 'date') else None
-            
-            if not day or day.strip() == "":
-                plans_without_day += 1
-                print(f"DEBUG: Skipping plan with no day: id={plan.id}, item_id={plan.item_id}, item_type={plan.item_type}")
-                continue
-            plans_with_day += 1
-            
-            # Use date as key if available, otherwise use day
-            key = date if date else day
-            if key not in date_groups:
-                date_groups[key] = {
-                    "day": day,
-                    "date": date,
-                    "time_slots": []
-                }
-            
-            # Get item name (use stored name or fetch from database)
-            item_name = plan.item_name if plan.item_name else f"Item {plan.item_id}"
-            
-            # Get subject name from assignment or exam
-            subject_name = "N/A"
-            try:
-                if plan.item_type == "assignment":
-                    assignment = assignment_model.get_assignment(db, plan.item_id)
-                    if assignment:
-                        subject_name = assignment.subject_name
-                elif plan.item_type == "exam":
-                    exam = exam_model.get_exam(db, plan.item_id)
-                    if exam:
-                        subject_name = exam.subject_name
-            except Exception as e:
-                print(f"Error fetching subject name: {e}")
-            
-            slot_data = {
-                "time": plan.time_slot,
-                "item_name": item_name,
-                "category": plan.category if plan.category else plan.item_type,
-                "subject_name": subject_name,
-                "hours": plan.hours,
-                "date": date  # Include date for calendar
-            }
-            date_groups[key]["time_slots"].append(slot_data)
-            print(f"DEBUG: Added slot to {key}: {slot_data}")
+        # Subject name stored on the row, or looked up in one batch for older rows
+        subject_name = subject_names.get((plan.item_type, plan.item_id)) or "N/A"
         
-        # Convert to list format, sorted by date if available
-        result = []
-        if any(dg.get("date") for dg in date_groups.values()):
-            # Sort by date
-            sorted_items = sorted(
-                date_groups.items(),
-                key=lambda x: x[1]["date"] if x[1]["date"] else "9999-99-99"
-            )
-            for key, group in sorted_items:
+        slot_data = {
+            "time": plan.time_slot,
+            "item_name": item_name,
+            "category": plan.category if plan.category else plan.item_type,
+            "subject_name": subject_name,
+            "hours": plan.hours,
+            "date": date  # Include date for calendar
+        }
+        date_groups[key]["time_slots"].append(slot_data)
+        print(f"DEBUG: Added slot to {key}: {slot_data}")
+    
+    # Convert to list format, sorted by date if available
+    result = []
+    if any(dg.get("date") for dg in date_groups.values()):
+        # Sort by date
+        sorted_items = sorted(
+            date_groups.items(),
+            key=lambda x: x[1]["date"] if x[1]["date"] else "9999-99-99"
+        )
+        for key, group in sorted_items:
+            result.append({
+                "day": group["day"],
+                "date": group["date"],
+                "time_slots": group["time_slots"]
+            })
+    else:
+        # Fallback to day-based ordering
+        days_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+        for day in days_order:
+            if day in date_groups:
                 result.append({
-                    "day": group["day"],
-                    "date": group["date"],
-                    "time_slots": group["time_slots"]
+                    "day": day,
+                    "date": date_groups[day]["date"],
+                    "time_slots": date_groups[day]["time_slots"]
                 })
-        else:
-            # Fallback to day-based ordering
-            days_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-            for day in days_order:
-                if day in date_groups:
-                    result.append({
-                        "day": day,
-                        "date": date_groups[day]["date"],
-                        "time_slots": date_groups[day]["time_slots"]
-                    })
-        
-        print(f"DEBUG: Plans with day: {plans_with_day}, Plans without day: {plans_without_day}")
-        print(f"DEBUG: Returning {len(result)} days with plans, total slots: {sum(len(r['time_slots']) for r in result)}")
-        
-        if plans_with_day == 0 and plans_without_day > 0:
-            print(f"WARNING: All {plans_without_day} plans have no day field!")
-        
-        return result
+    
+    print(f"DEBUG: Plans with day: {plans_with_day}, Plans without day: {plans_without_day}")
+    print(f"DEBUG: Returning {len(result)} days with plans, total slots: {sum(len(r['time_slots']) for r in result)}")
+    
+    if plans_with_day == 0 and plans_without_day > 0:
+        print(f"WARNING: All {plans_without_day} plans have no day field!")
+    
+    return result, headers
+
+@router.get("/weekly", response_model=List[dict])
+def get_weekly_plan(
+    request: Request,
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    days: Optional[int] = Query(None, ge=1, le=366),
+    db: Session = Depends(get_db)
+):
+    """
+    Get weekly study plan.
+    from/to (YYYY-MM-DD) limit the plan to a date range, and days pages through it
+    a number of dates at a time: pass the X-Next-Cursor response header back as
+    cursor to get the next page. Without any of these the whole plan is returned.
+    Supports If-None-Match.
+    """
+    for name, value in (("from", from_date), ("to", to_date), ("cursor", cursor)):
+        if value is not None and get_date_ordinal(value) is None:
+            raise HTTPException(status_code=400, detail=f"Invalid '{name}' date, expected YYYY-MM-DD")
+    
+    try:
+        # Subject names of older plan rows come from assignments and exams
+        return conditional_response(
+            request,
+            ("plans", "assignments", "exams"),
+            lambda: _build_weekly_plan(db, from_date, to_date, cursor, days)
+        )
     except Exception as e:
         print(f"Error in get_weekly_plan: {e}")
         import traceback
@@ -312,6 +359,34 @@ def debug_plans(db: Session = Depends(get_db)):
         "plans": plans_data
     }
 
+@router.get("/cache")
+def get_plan_cache_stats():
+    """Plan cache hit/miss counters"""
+    return plan_cache.stats()
+
+@router.get("/versions")
+def list_plan_versions(db: Session = Depends(get_db)):
+    """Stored plan versions, newest first"""
+    active_id = plan_model.get_active_version_id(db)
+    return [
+        {
+            "id": version.id,
+            "slot_count": version.slot_count,
+            "input_hash": version.input_hash,
+            "created_at": version.created_at,
+            "active": version.id == active_id
+        }
+        for version in plan_model.get_plan_versions(db)
+    ]
+
+@router.post("/versions/{version_id}/activate")
+def activate_plan_version(version_id: int, db: Session = Depends(get_db)):
+    """Roll the active plan back (or forward) to a stored version"""
+    version = plan_model.activate_plan_version(db, version_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Plan version not found")
+    return {"message": f"Plan version {version.id} is now active", "version_id": version.id}
+
 @router.delete("/clear")
 def clear_plan(db: Session = Depends(get_db)):
     """Clear all study plans"""
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
 from app.models.database import get_db
 from app.models import subject as subject_model
 from app.schemas import subject_schema
+from app.services.response_cache import conditional_response
 import json
 
 router = APIRouter(prefix="/api/subjects", tags=["subjects"])
@@ -40,21 +41,22 @@ def create_subject(subject: subject_schema.SubjectCreate, db: Session = Depends(
         raise HTTPException(status_code=500, detail=f"Error creating subject: {str(e)}")
 
 @router.get("/", response_model=List[subject_schema.SubjectResponse])
-def get_subjects(db: Session = Depends(get_db)):
-    """Get all subjects"""
-    import json
-    subjects = subject_model.get_all_subjects(db)
-    # Convert JSON strings back to lists
-    for subject in subjects:
-        try:
-            subject.past_assignments = json.loads(subject.past_assignments) if subject.past_assignments else []
-        except:
-            subject.past_assignments = []
-        try:
-            subject.questionnaire_results = json.loads(subject.questionnaire_results) if subject.questionnaire_results else []
-        except:
-            subject.questionnaire_results = []
-    return subjects
+def get_subjects(request: Request, db: Session = Depends(get_db)):
+    """Get all subjects (supports If-None-Match)"""
+    def build():
+        subjects = subject_model.get_all_subjects(db)
+        # Convert JSON strings back to lists
+        for subject in subjects:
+            try:
+                subject.past_assignments = json.loads(subject.past_assignments) if subject.past_assignments else []
+            except:
+                subject.past_assignments = []
+            try:
+                subject.questionnaire_results = json.loads(subject.questionnaire_results) if subject.questionnaire_results else []
+            except:
+                subject.questionnaire_results = []
+        return [subject_schema.SubjectResponse.model_validate(s) for s in subjects], {}
+    return conditional_response(request, ("subjects",), build)
 
 @router.get("/{subject_id}", response_model=subject_schema.SubjectResponse)
 def get_subject(subject_id: int, db: Session = Depends(get_db)):
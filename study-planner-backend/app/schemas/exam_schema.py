@@ -17,9 +17,11 @@ class ExamCreate(ExamBase):
 
 class ExamResponse(ExamBase):
     id: int
+    actual_hours: Optional[float] = None
     created_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
-
+class ExamFeedback(BaseModel):
+    actual_hours: float  # Hours actually spent studying for the exam
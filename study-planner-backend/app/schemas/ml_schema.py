@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import List
+
+class PredictionRow(BaseModel):
+    past_score: float
+    difficulty: str = "medium"  # easy, medium, hard
+    chapters: int
+    days_left: int
+
+class PredictBatchRequest(BaseModel):
+    rows: List[PredictionRow]
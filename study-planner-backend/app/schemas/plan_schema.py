@@ -22,6 +22,8 @@ class GeneratePlanRequest(BaseModel):
     available_hours_per_day: float
     start_date: Optional[str] = None
     end_date: Optional[str] = None  # Optional - will be auto-calculated if not provided
+    engine: str = "heap"  # Allocation engine: "heap", "matrix" or "scan" (the O(days x items) reference engine)
+    incremental: bool = False  # Only rewrite plan rows that changed, from start_date onwards
 
 class WeeklyPlanResponse(BaseModel):
     day: str
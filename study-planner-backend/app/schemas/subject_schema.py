@@ -29,7 +29,7 @@ class SubjectResponse(SubjectBase):
 
 class ReminderResponse(BaseModel):
     id: int
-    subject_id: int
+    subject_id: Optional[int] = None  # Automatic reminders are not tied to a subject
     message: str
     reminder_date: str
     is_read: bool
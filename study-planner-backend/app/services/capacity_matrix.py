@@ -0,0 +1,130 @@
+"""
+Capacity Matrix Allocation Engine
+Alternative to the heap allocator in scheduler.py. Slot assignments live in dense
+days x slots NumPy arrays, and item deadlines, hours and allocation state live in
+parallel arrays, so eligibility and allocation run as vectorized batch operations.
+Plan dicts are only built at the output boundary.
+"""
+from datetime import datetime
+import numpy as np
+from app.utils.date_utils import get_date_ordinal
+
+NO_DEADLINE = np.iinfo(np.int64).max
+
+def _deadline_ordinals(all_items):
+    parsed = {}
+    ordinals = np.empty(len(all_items), dtype=np.int64)
+    for idx, item in enumerate(all_items):
+        deadline = item.get("deadline", "")
+        if deadline not in parsed:
+            ordinal = get_date_ordinal(deadline)
+            # Missing or unparseable deadlines never expire, as in the greedy scheduler
+            parsed[deadline] = NO_DEADLINE if ordinal is None else ordinal
+        ordinals[idx] = parsed[deadline]
+    return ordinals
+
+def _account_indices(all_items):
+    """
+    Map items to allocation accounts. Hours are tracked per item id (an assignment
+    and an exam sharing an id draw from the same account, as in the greedy scheduler).
+    """
+    accounts = {}
+    indices = np.empty(len(all_items), dtype=np.int64)
+    for idx, item in enumerate(all_items):
+        indices[idx] = accounts.setdefault(item.get("id"), len(accounts))
+    return indices, len(accounts)
+
+def allocate_with_capacity_matrix(all_items, dates, available_hours_per_day: float, time_slots):
+    """
+    Allocate study slots using a days x slots capacity matrix.
+    all_items must already be sorted by (priority, days until deadline).
+    Produces the same plan as scheduler.allocate_time_slots.
+    """
+    n_days = len(dates)
+    n_slots = len(time_slots)
+
+    deadlines = _deadline_ordinals(all_items)
+    hours = np.array([float(item.get("hours", 0)) for item in all_items], dtype=np.float64)
+    accounts, n_accounts = _account_indices(all_items)
+    allocated = np.zeros(n_accounts, dtype=np.float64)
+    day_ordinals = np.array([get_date_ordinal(date) for date in dates], dtype=np.int64)
+
+    # Hours each slot of a day can hold given what earlier slots may have used
+    slot_capacity = np.minimum(1.0, available_hours_per_day - np.arange(n_slots, dtype=np.float64))
+    slot_item = np.full((n_days, n_slots), -1, dtype=np.int64)
+    slot_hours = np.zeros((n_days, n_slots), dtype=np.float64)
+    slots_used = np.zeros(n_days, dtype=np.int64)
+
+    # Items still in play, in priority order. Expired or fully allocated items
+    # are dropped for good, so the working set only shrinks.
+    live = np.arange(len(all_items), dtype=np.int64)
+
+    for day_idx in range(n_days):
+        if not live.size or not n_slots:
+            break
+
+        # Only the head of the priority order can be picked today: evaluate the
+        # eligibility mask over a window that grows until it holds a full day
+        window_size = n_slots * 4
+        while True:
+            window = live[:window_size]
+            remaining = hours[window] - allocated[accounts[window]]
+            eligible = (deadlines[window] >= day_ordinals[day_idx]) & (remaining > 0)
+            if window.size == live.size or np.count_nonzero(eligible) >= n_slots:
+                break
+            window_size *= 2
+
+        if not eligible.all():
+            live = np.concatenate((window[eligible], live[window.size:]))
+        remaining = remaining[eligible]
+
+        candidates = live[:n_slots]
+        candidate_accounts = accounts[candidates]
+        if np.unique(candidate_accounts).size == candidates.size:
+            # No shared accounts among today's picks: allocate the batch at once
+            count = candidates.size
+            allocation = np.minimum(slot_capacity[:count], remaining[:count])
+            allocated[candidate_accounts] += allocation
+            slot_item[day_idx, :count] = candidates
+            slot_hours[day_idx, :count] = allocation
+            slots_used[day_idx] = count
+        else:
+            # Items sharing an account must see each other's allocation today
+            count = 0
+            for item_idx in live:
+                if count >= n_slots:
+                    break
+                if deadlines[item_idx] < day_ordinals[day_idx]:
+                    continue  # Beyond the evaluated window, not yet filtered
+                account = accounts[item_idx]
+                item_remaining = hours[item_idx] - allocated[account]
+                if item_remaining <= 0:
+                    continue
+                allocation = min(slot_capacity[count], item_remaining)
+                allocated[account] += allocation
+                slot_item[day_idx, count] = item_idx
+                slot_hours[day_idx, count] = allocation
+                count += 1
+            slots_used[day_idx] = count
+
+    # Output boundary: build plan dicts
+    study_plan = []
+    for day_idx, date in enumerate(dates):
+        day_slots = []
+        for slot_idx in range(slots_used[day_idx]):
+            item = all_items[slot_item[day_idx, slot_idx]]
+            day_slots.append({
+                "time": time_slots[slot_idx],
+                "item_id": item.get("id"),
+                "item_name": item.get("name", ""),
+                "category": item.get("category", ""),
+                "subject_name": item.get("subject_name", ""),
+                "hours": float(slot_hours[day_idx, slot_idx])
+            })
+        study_plan.append({
+            "date": date,
+            "day": datetime.fromordinal(int(day_ordinals[day_idx])).strftime("%A"),
+            "time_slots": day_slots
+        })
+
+    return study_plan
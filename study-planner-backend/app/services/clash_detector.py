@@ -1,103 +1,127 @@
-from datetime import datetime, timedelta
+from datetime import date
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from app.models.database import Assignment, Exam, Notification
+from app.models.database import Assignment, Exam
 from app.models import notification as notification_model
+from app.utils.date_utils import get_date_ordinal
 
-def detect_all_clashes(db: Session):
+CLASH_WINDOW_DAYS = 1  # Items due within this many days of each other clash
+
+def _window_phrase(window_days: int) -> str:
+    return "1 day" if window_days == 1 else f"{window_days} days"
+
+def find_clash_pairs(assignments, exams, window_days: int = CLASH_WINDOW_DAYS):
+    """
+    Sort-and-sweep clash search.
+    Each date is parsed once and all items are sorted by date ordinal; every item is
+    then compared only with the neighbours that follow it within window_days.
+    Returns (kind, first, second, same_date) tuples in the order a full pairwise scan
+    would produce them, where kind is "assignment", "exam" or "both".
+    """
+    entries = []  # (ordinal, category, index); category 0 = assignment, 1 = exam
+    unparsed = {}  # Dates that cannot be parsed only clash with the identical string
+    for category, items, date_attr in ((0, assignments, "due_date"), (1, exams, "exam_date")):
+        for idx, item in enumerate(items):
+            date_str = getattr(item, date_attr)
+            ordinal = get_date_ordinal(date_str)
+            if ordinal is None:
+                unparsed.setdefault(date_str, []).append((category, idx))
+            else:
+                entries.append((ordinal, category, idx))
+    entries.sort()
+
+    candidates = []
+    for pos, (ordinal, category, idx) in enumerate(entries):
+        neighbour = pos + 1
+        while neighbour < len(entries) and entries[neighbour][0] - ordinal <= window_days:
+            _, other_category, other_idx = entries[neighbour]
+            candidates.append((category, idx, other_category, other_idx))
+            neighbour += 1
+    for group in unparsed.values():
+        for pos, (category, idx) in enumerate(group):
+            for other_category, other_idx in group[pos + 1:]:
+                candidates.append((category, idx, other_category, other_idx))
+
+    ordered = []
+    for category, idx, other_category, other_idx in candidates:
+        if category == other_category:
+            first, second = min(idx, other_idx), max(idx, other_idx)
+            if category == 0:
+                a1, a2 = assignments[first], assignments[second]
+                ordered.append(((0, first, second), ("assignment", a1, a2, a1.due_date == a2.due_date)))
+            else:
+                e1, e2 = exams[first], exams[second]
+                # Exams only clash when they fall on the same date
+                if e1.exam_date == e2.exam_date:
+                    ordered.append(((1, first, second), ("exam", e1, e2, True)))
+        else:
+            a_idx, e_idx = (idx, other_idx) if category == 0 else (other_idx, idx)
+            assignment, exam = assignments[a_idx], exams[e_idx]
+            ordered.append(((2, a_idx, e_idx), ("both", assignment, exam, assignment.due_date == exam.exam_date)))
+
+    ordered.sort(key=lambda entry: entry[0])
+    return [pair for _, pair in ordered]
+
+def build_clash_notification(kind, first, second, same_date: bool, window_days: int = CLASH_WINDOW_DAYS):
+    """Notification payload for one clashing pair"""
+    if kind == "assignment":
+        if same_date:
+            return {
+                "type": "clash",
+                "title": "Assignment Clash Detected",
+                "message": f"'{first.name}' and '{second.name}' are due on the same date ({first.due_date})",
+                "item_type": "assignment",
+                "item_ids": f"{first.id},{second.id}"
+            }
+        return {
+            "type": "clash",
+            "title": "Assignment Clash Warning",
+            "message": f"'{first.name}' (due {first.due_date}) and '{second.name}' (due {second.due_date}) are due within {_window_phrase(window_days)} of each other",
+            "item_type": "assignment",
+            "item_ids": f"{first.id},{second.id}"
+        }
+    if kind == "exam":
+        return {
+            "type": "clash",
+            "title": "Exam Clash Detected",
+            "message": f"'{first.name}' and '{second.name}' are scheduled on the same date ({first.exam_date})",
+            "item_type": "exam",
+            "item_ids": f"{first.id},{second.id}"
+        }
+    if same_date:
+        return {
+            "type": "clash",
+            "title": "Assignment-Exam Clash",
+            "message": f"Assignment '{first.name}' is due on the same date as exam '{second.name}' ({first.due_date})",
+            "item_type": "both",
+            "item_ids": f"assignment:{first.id},exam:{second.id}"
+        }
+    return {
+        "type": "clash",
+        "title": "Assignment-Exam Conflict",
+        "message": f"Assignment '{first.name}' (due {first.due_date}) and exam '{second.name}' (on {second.exam_date}) are within {_window_phrase(window_days)} of each other",
+        "item_type": "both",
+        "item_ids": f"assignment:{first.id},exam:{second.id}"
+    }
+
+def detect_all_clashes(db: Session, window_days: int = CLASH_WINDOW_DAYS):
     """
     Detect all types of clashes:
     - Assignment-Assignment overlaps
     - Assignment-Exam overlaps
     - Exam-Exam overlaps
     """
-    notifications = []
-    
     # Get all assignments and exams
     assignments = db.query(Assignment).all()
     exams = db.query(Exam).all()
     
-    # Detect Assignment-Assignment clashes
-    for i, assgn1 in enumerate(assignments):
-        for assgn2 in assignments[i+1:]:
-            if assgn1.due_date == assgn2.due_date:
-                # Same due date
-                notification = {
-                    "type": "clash",
-                    "title": "Assignment Clash Detected",
-                    "message": f"'{assgn1.name}' and '{assgn2.name}' are due on the same date ({assgn1.due_date})",
-                    "item_type": "assignment",
-                    "item_ids": f"{assgn1.id},{assgn2.id}"
-                }
-                notifications.append(notification)
-            else:
-                # Check if within 1 day of each other
-                try:
-                    date1 = datetime.strptime(assgn1.due_date, "%Y-%m-%d")
-                    date2 = datetime.strptime(assgn2.due_date, "%Y-%m-%d")
-                    if abs((date1 - date2).days) <= 1:
-                        notification = {
-                            "type": "clash",
-                            "title": "Assignment Clash Warning",
-                            "message": f"'{assgn1.name}' (due {assgn1.due_date}) and '{assgn2.name}' (due {assgn2.due_date}) are due within 1 day of each other",
-                            "item_type": "assignment",
-                            "item_ids": f"{assgn1.id},{assgn2.id}"
-                        }
-                        notifications.append(notification)
-                except:
-                    pass
+    notifications = [
+        build_clash_notification(kind, first, second, same_date, window_days)
+        for kind, first, second, same_date in find_clash_pairs(assignments, exams, window_days)
+    ]
     
-    # Detect Exam-Exam clashes
-    for i, exam1 in enumerate(exams):
-        for exam2 in exams[i+1:]:
-            if exam1.exam_date == exam2.exam_date:
-                notification = {
-                    "type": "clash",
-                    "title": "Exam Clash Detected",
-                    "message": f"'{exam1.name}' and '{exam2.name}' are scheduled on the same date ({exam1.exam_date})",
-                    "item_type": "exam",
-                    "item_ids": f"{exam1.id},{exam2.id}"
-                }
-                notifications.append(notification)
-    
-    # Detect Assignment-Exam clashes
-    for assignment in assignments:
-        for exam in exams:
-            if assignment.due_date == exam.exam_date:
-                notification = {
-                    "type": "clash",
-                    "title": "Assignment-Exam Clash",
-                    "message": f"Assignment '{assignment.name}' is due on the same date as exam '{exam.name}' ({assignment.due_date})",
-                    "item_type": "both",
-                    "item_ids": f"assignment:{assignment.id},exam:{exam.id}"
-                }
-                notifications.append(notification)
-            else:
-                # Check if within 1 day
-                try:
-                    assgn_date = datetime.strptime(assignment.due_date, "%Y-%m-%d")
-                    exam_date = datetime.strptime(exam.exam_date, "%Y-%m-%d")
-                    if abs((assgn_date - exam_date).days) <= 1:
-                        notification = {
-                            "type": "clash",
-                            "title": "Assignment-Exam Conflict",
-                            "message": f"Assignment '{assignment.name}' (due {assignment.due_date}) and exam '{exam.name}' (on {exam.exam_date}) are within 1 day of each other",
-                            "item_type": "both",
-                            "item_ids": f"assignment:{assignment.id},exam:{exam.id}"
-                        }
-                        notifications.append(notification)
-                except:
-                    pass
-    
-    # Create notifications in database
-    for notif_data in notifications:
-        # Check if notification already exists
-        existing = db.query(Notification).filter(
-            Notification.message == notif_data["message"],
-            Notification.is_read == False
-        ).first()
-        
-        if not existing:
-            notification_model.create_notification(db, notif_data)
+    # Create notifications that are not already pending, in one batch
+    notification_model.bulk_create_notifications(db, notifications)
     
     return notifications
 
@@ -113,23 +137,15 @@ def get_clash_summary(db: Session):
         "total_clashes": 0
     }
     
-    # Count assignment-assignment
-    for i, assgn1 in enumerate(assignments):
-        for assgn2 in assignments[i+1:]:
-            if assgn1.due_date == assgn2.due_date:
-                summary["assignment_assignment_clashes"] += 1
-    
-    # Count exam-exam
-    for i, exam1 in enumerate(exams):
-        for exam2 in exams[i+1:]:
-            if exam1.exam_date == exam2.exam_date:
-                summary["exam_exam_clashes"] += 1
-    
-    # Count assignment-exam
-    for assignment in assignments:
-        for exam in exams:
-            if assignment.due_date == exam.exam_date:
-                summary["assignment_exam_clashes"] += 1
+    # Same-date clashes only
+    summary_keys = {
+        "assignment": "assignment_assignment_clashes",
+        "exam": "exam_exam_clashes",
+        "both": "assignment_exam_clashes"
+    }
+    for kind, _, _, same_date in find_clash_pairs(assignments, exams, window_days=0):
+        if same_date:
+            summary[summary_keys[kind]] += 1
     
     summary["total_clashes"] = (
         summary["assignment_assignment_clashes"] +
@@ -139,3 +155,54 @@ def get_clash_summary(db: Session):
     
     return summary
 
+
+def _items_near(db: Session, model, date_column, date_str, window_days: int):
+    """Rows dated within window_days of date_str, via an indexed range query"""
+    ordinal = get_date_ordinal(date_str)
+    if ordinal is None:
+        # Unparseable dates only clash with the identical string
+        return db.query(model).filter(date_column == date_str).order_by(model.id).all()
+    # Dates are normalized to zero-padded form on write (and by migrate_item_dates),
+    # so a string range is a date range
+    low = date.fromordinal(ordinal - window_days).isoformat()
+    high = date.fromordinal(ordinal + window_days).isoformat()
+    return db.query(model).filter(
+        or_(date_column.between(low, high), date_column == date_str)
+    ).order_by(model.id).all()
+
+def detect_clashes_for_item(db: Session, item_type: str, item_id: int, window_days: int = CLASH_WINDOW_DAYS):
+    """
+    Incremental clash detection after a single assignment or exam is created,
+    updated or deleted. Only the touched item's date neighbours are loaded and
+    compared with it. Clash notifications that reference the item but no longer
+    apply are retired. Returns the notifications that currently apply to the item.
+    """
+    if item_type == "assignment":
+        item = db.query(Assignment).filter(Assignment.id == item_id).first()
+        date_str = item.due_date if item else None
+    else:
+        item = db.query(Exam).filter(Exam.id == item_id).first()
+        date_str = item.exam_date if item else None
+    
+    notifications = []
+    if item is not None:
+        assignments = _items_near(db, Assignment, Assignment.due_date, date_str, window_days)
+        exams = _items_near(db, Exam, Exam.exam_date, date_str, window_days)
+        notifications = [
+            build_clash_notification(kind, first, second, same_date, window_days)
+            for kind, first, second, same_date in find_clash_pairs(assignments, exams, window_days)
+            if first is item or second is item
+        ]
+    
+    # Retire clashes involving this item that no longer hold (or all of them on delete)
+    current_keys = {notification_model.notification_dedup_key(n) for n in notifications}
+    stale_ids = [
+        notification.id
+        for notification in notification_model.get_clash_notifications_for_item(db, item_type, item_id)
+        if notification.dedup_key not in current_keys
+    ]
+    notification_model.delete_notifications(db, stale_ids)
+    
+    notification_model.bulk_create_notifications(db, notifications)
+    
+    return notifications
@@ -0,0 +1,186 @@
+"""
+Daily Background Jobs
+A daemon thread started from the app's startup hook runs each registered job at
+most once per day. Every job has a row in job_runs whose last_run_date acts as a
+persisted watermark: a worker only runs the job after atomically advancing the
+watermark to today, so several API workers never duplicate the work.
+"""
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models.database import SessionLocal, JobRun, Assignment, Exam
+from app.models import plan as plan_model, resource_versions
+from app.services.reminder_service import generate_automatic_reminders
+from app.services.retention import run_retention_job
+from app.utils.date_utils import get_days_until_exam
+from app.utils.priority_utils import priority_for_days_left
+
+# How often the daemon checks whether a job is due
+DAILY_JOBS_CHECK_SECONDS = float(os.environ.get("DAILY_JOBS_CHECK_SECONDS", "900"))
+DAILY_JOBS_ENABLED = os.environ.get("DAILY_JOBS_ENABLED", "1") != "0"
+
+def refresh_priorities(db: Session):
+    """
+    Recompute assignment and exam priorities from the days left, which otherwise
+    only change when the row is edited. Returns the number of rows updated.
+    """
+    updated = 0
+    for model, date_attr, resource in ((Assignment, "due_date", "assignments"), (Exam, "exam_date", "exams")):
+        changes = []
+        for row in db.query(model.id, model.priority, getattr(model, date_attr)):
+            priority = priority_for_days_left(get_days_until_exam(row[2]))
+            if priority != row.priority:
+                changes.append({"id": row.id, "priority": priority})
+        if changes:
+            db.execute(update(model), changes)
+            updated += len(changes)
+            resource_versions.bump(db, resource)
+            db.commit()
+    return updated
+
+def run_reminders_job(db: Session):
+    return len(generate_automatic_reminders(db))
+
+# Job name -> callable(db) returning the number of rows produced, or
+# (rows, report) for jobs whose details are kept in job_runs.report
+DAILY_JOBS = {
+    "priorities": refresh_priorities,
+    "reminders": run_reminders_job,
+    # Catches versions left behind if a post-generation cleanup did not run
+    "plan_versions": plan_model.delete_old_plan_versions,
+    "retention": run_retention_job,
+}
+
+def claim_job(db: Session, name: str, today: str):
+    """
+    Atomically advance the job's watermark to today.
+    Returns the previous watermark if this worker claimed the run, or False if the
+    job already ran (or is running) today.
+    """
+    db.execute(sqlite_insert(JobRun.__table__).values(name=name, rows_produced=0).on_conflict_do_nothing())
+    previous = db.query(JobRun.last_run_date).filter(JobRun.name == name).scalar()
+    result = db.execute(
+        update(JobRun)
+        .where(JobRun.name == name)
+        .where((JobRun.last_run_date == None) | (JobRun.last_run_date < today))
+        .values(last_run_date=today, started_at=datetime.utcnow(), status="running", error=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount != 1:
+        return False
+    return previous or ""
+
+def run_job(name: str, force: bool = False):
+    """Run one daily job if it has not run today (or unconditionally with force)"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    db = SessionLocal()
+    try:
+        previous = claim_job(db, name, today)
+        if previous is False:
+            if not force:
+                return None
+            previous = today
+            db.query(JobRun).filter(JobRun.name == name).update(
+                {"started_at": datetime.utcnow(), "status": "running", "error": None}
+            )
+            db.commit()
+
+        started = time.time()
+        try:
+            result = DAILY_JOBS[name](db)
+            rows, report = result if isinstance(result, tuple) else (result, None)
+            status, error = "success", None
+        except Exception as e:
+            db.rollback()
+            rows, report, status, error = 0, None, "failed", str(e)
+            print(f"Error running daily job {name}: {e}")
+            traceback.print_exc()
+
+        values = {
+            "finished_at": datetime.utcnow(),
+            "duration_seconds": round(time.time() - started, 4),
+            "rows_produced": rows,
+            "status": status,
+            "error": error
+        }
+        if report is not None:
+            values["report"] = json.dumps(report)
+        if status == "failed":
+            # Give the watermark back so the next check retries
+            values["last_run_date"] = previous or None
+        db.query(JobRun).filter(JobRun.name == name).update(values)
+        db.commit()
+        return dict(values, report=report) if report is not None else values
+    finally:
+        db.close()
+
+def run_due_jobs():
+    for name in DAILY_JOBS:
+        run_job(name)
+
+def get_job_status(db: Session):
+    runs = {run.name: run for run in db.query(JobRun).all()}
+    jobs = []
+    for name in DAILY_JOBS:
+        run = runs.get(name)
+        jobs.append({
+            "name": name,
+            "last_run_date": run.last_run_date if run else None,
+            "started_at": run.started_at if run else None,
+            "finished_at": run.finished_at if run else None,
+            "duration_seconds": run.duration_seconds if run else None,
+            "rows_produced": run.rows_produced if run else 0,
+            "status": run.status if run else "never_run",
+            "error": run.error if run else None
+        })
+    return {
+        "daemon_running": daily_job_daemon.is_running(),
+        "check_interval_seconds": daily_job_daemon.interval_seconds,
+        "jobs": jobs
+    }
+
+def get_job_report(db: Session, name: str):
+    """Details stored by the job's last successful run, or None"""
+    report = db.query(JobRun.report).filter(JobRun.name == name).scalar()
+    return json.loads(report) if report else None
+
+class DailyJobDaemon:
+    """Thread that checks for due daily jobs on a fixed interval"""
+
+    def __init__(self, interval_seconds: float = DAILY_JOBS_CHECK_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not DAILY_JOBS_ENABLED or self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="daily-jobs", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                run_due_jobs()
+            except Exception as e:
+                print(f"Error checking daily jobs: {e}")
+                traceback.print_exc()
+            self._stop.wait(self.interval_seconds)
+
+daily_job_daemon = DailyJobDaemon()
@@ -0,0 +1,146 @@
+"""
+Notification Event Bus
+Fan-out of notification, reminder and unread-count events to the Server-Sent
+Events stream. Events are driven by the database, which every API worker shares:
+while a client is connected, a poller thread in each worker reads notifications
+and reminders above the last id it has seen and the unread count, so a clash
+found or a reminder created by any worker (or the daily jobs) reaches every
+client. Events are handed to the event loop thread-safely; every connected client
+has its own bounded asyncio queue, so an idle connection costs nothing but its queue.
+"""
+import asyncio
+import itertools
+import os
+import threading
+import time
+from app.models.database import SessionLocal
+from app.models import notification as notification_model, subject as subject_model
+
+# Events buffered per client before the oldest ones are dropped
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "100"))
+# How often the database is checked for new events while clients are connected
+EVENT_POLL_SECONDS = float(os.environ.get("EVENT_POLL_SECONDS", "1.0"))
+
+class EventBus:
+    """Database poller publishing to asyncio subscriber queues"""
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE, poll_seconds: float = EVENT_POLL_SECONDS):
+        self.queue_size = queue_size
+        self.poll_seconds = poll_seconds
+        self._subscribers = set()
+        self._loop = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._poller = None
+        self._last_notification_id = None
+        self._last_reminder_id = None
+        self._last_unread_count = None
+        self.published = 0
+        self.dropped = 0
+        self.polls = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a client; must be called from the event loop"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.add(queue)
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_loop, name="event-poller", daemon=True)
+                self._poller.start()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers.discard(queue)
+
+    def has_subscribers(self) -> bool:
+        with self._lock:
+            return bool(self._subscribers)
+
+    def _poll_loop(self):
+        self._last_notification_id = None  # Start from the current state, not history
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error polling for notification events: {e}")
+            time.sleep(self.poll_seconds)
+
+    def poll(self):
+        """Publish rows added since the last poll and unread-count changes"""
+        db = SessionLocal()
+        try:
+            if self._last_notification_id is None:
+                self._last_notification_id = notification_model.get_max_notification_id(db)
+                self._last_reminder_id = subject_model.get_max_reminder_id(db)
+                self._last_unread_count = notification_model.count_unread_notifications(db)
+                return
+            self.polls += 1
+            for notification in notification_model.get_notifications_after(db, self._last_notification_id):
+                self._last_notification_id = notification.id
+                if notification.is_read:
+                    continue
+                self.publish("notification", {
+                    "id": notification.id,
+                    "type": notification.type,
+                    "title": notification.title,
+                    "message": notification.message,
+                    "item_type": notification.item_type,
+                    "item_ids": notification.item_ids,
+                    "created_at": notification.created_at.isoformat() if notification.created_at else None
+                })
+            for reminder in subject_model.get_reminders_after(db, self._last_reminder_id):
+                self._last_reminder_id = reminder.id
+                self.publish("reminder", {
+                    "id": reminder.id,
+                    "subject_id": reminder.subject_id,
+                    "message": reminder.message,
+                    "reminder_date": reminder.reminder_date,
+                    "is_read": reminder.is_read
+                })
+            count = notification_model.count_unread_notifications(db)
+            if count != self._last_unread_count:
+                self._last_unread_count = count
+                self.publish("unread_count", {"count": count})
+        finally:
+            db.close()
+
+    def publish(self, event_type: str, data):
+        """Send an event to every connected client; safe to call from any thread"""
+        with self._lock:
+            if not self._subscribers or self._loop is None:
+                return
+            loop = self._loop
+            event = {"id": next(self._ids), "event": event_type, "data": data}
+            self.published += 1
+        try:
+            loop.call_soon_threadsafe(self._dispatch, event)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    def _dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for queue in subscribers:
+            if queue.full():
+                # Slow client: drop its oldest event rather than block everyone
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "dropped": self.dropped,
+                "polls": self.polls,
+                "poll_seconds": self.poll_seconds
+            }
+
+event_bus = EventBus()
@@ -1,13 +1,37 @@
-import pandas as pd
+"""
+Study Hours Model
+Trained models are stored as a small versioned JSON document (feature order,
+coefficients, intercept), so inference is plain Python/NumPy arithmetic and
+pandas is only imported when a model is trained. Training streams the CSV and
+exam feedback in chunks into the normal equations, so memory does not grow with
+the amount of history. Documents are
+published through the model registry, which keeps every version and an atomic
+pointer to the active one.
+"""
+import json
 import numpy as np
-from sklearn.linear_model import LinearRegression
-import pickle
 import os
+import threading
+import time
+from datetime import datetime
+from app.services import model_registry
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "study_model.pkl")
+# Pre-registry model file, imported as the first version if present
+LEGACY_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "study_model.json")
+MODEL_FORMAT = "study-planner-linear"
+MODEL_FORMAT_VERSION = 1
+FEATURES = ["past_score", "difficulty_level", "chapters", "days_left"]
+TARGET = "recommended_hours"
+TRAINING_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "ml_training_data.csv")
+# Rows per chunk when streaming training data from the CSV and the exams table
+TRAINING_CHUNK_ROWS = int(os.environ.get("TRAINING_CHUNK_ROWS", "50000"))
+# How often the resident model checks whether another worker moved the registry pointer
+MODEL_RELOAD_CHECK_SECONDS = float(os.environ.get("MODEL_RELOAD_CHECK_SECONDS", "2"))
 
 def create_training_data():
     """Create sample training data if it doesn't exist"""
+    import pandas as pd
+    
     data = {
         "past_score": [45, 65, 80, 55, 70, 40, 85, 60, 75, 50, 90, 35, 68, 72, 58],
         "difficulty_level": [2, 1, 0, 2, 1, 2, 0, 1, 0, 2, 0, 2, 1, 1, 2],  # 0=easy, 1=medium, 2=hard
@@ -18,65 +42,312 @@ def create_training_data():
     df = pd.DataFrame(data)
     return df
 
-def train_model():
-    """Train the ML model"""
-    # Check if training data file exists
-    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-    training_file = os.path.join(base_dir, "app", "data", "ml_training_data.csv")
+def export_coefficients(coefficients, intercept: float, training_rows: int) -> dict:
+    """Compact, pickle-free representation of a linear model"""
+    return {
+        "format": MODEL_FORMAT,
+        "version": MODEL_FORMAT_VERSION,
+        "features": list(FEATURES),
+        "coefficients": [float(c) for c in np.ravel(coefficients)],
+        "intercept": float(intercept),
+        "trained_at": datetime.utcnow().isoformat(),
+        "training_rows": int(training_rows)
+    }
+
+def export_model(model, training_rows: int) -> dict:
+    """Export a fitted scikit-learn linear model"""
+    return export_coefficients(model.coef_, model.intercept_, training_rows)
+
+def validate_model(model_data: dict) -> dict:
+    if model_data.get("format") != MODEL_FORMAT or model_data.get("version") != MODEL_FORMAT_VERSION:
+        raise ValueError("Unsupported model format")
+    if model_data.get("features") != FEATURES:
+        raise ValueError(f"Model features {model_data.get('features')} do not match {FEATURES}")
+    return model_data
+
+def publish_model(model_data: dict, source: str = "train") -> dict:
+    """Store model_data as a new registry version, make it active and resident"""
+    document = model_registry.publish_model(validate_model(model_data), source)
+    model_holder.swap(document)
+    return document
+
+def publish_merged_model(merge, source: str = "online") -> dict:
+    """Publish merge(active model document) as a new version, make it active and resident"""
+    document = model_registry.publish_merged(
+        lambda active: validate_model(merge(validate_model(active) if active is not None else None)), source
+    )
+    model_holder.swap(document)
+    return document
+
+def activate_model_version(version: int) -> dict:
+    """Roll the active model back (or forward) to a stored version"""
+    document = validate_model(model_registry.activate_version(version))
+    model_holder.swap(document)
+    return document
+
+def csv_training_chunks(path: str = TRAINING_FILE, chunk_rows: int = TRAINING_CHUNK_ROWS):
+    """(X, y) float64 arrays from the training CSV, read chunk_rows rows at a time"""
+    import pandas as pd
     
-    if os.path.exists(training_file):
-        data = pd.read_csv(training_file)
-    else:
+    columns = FEATURES + [TARGET]
+    reader = pd.read_csv(path, usecols=columns, dtype={column: "float64" for column in columns}, chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            yield chunk[FEATURES].to_numpy(), chunk[TARGET].to_numpy()
+
+def exam_training_chunks(chunk_rows: int = TRAINING_CHUNK_ROWS):
+    """(X, y) arrays for exams with reported actual hours, streamed from the database"""
+    from app.models.database import SessionLocal
+    from app.models import exam as exam_model
+    from app.utils.date_utils import get_days_left_at
+    
+    db = SessionLocal()
+    try:
+        for rows in exam_model.iter_feedback_rows(db, chunk_rows):
+            # The vector online learning absorbed, so a later correction downdates the
+            # same observation a retrained model was fitted on
+            X = np.array([
+                stored or feedback_features(past_score, difficulty, chapters, get_days_left_at(exam_date, created_at))
+                for exam_date, difficulty, past_score, chapters, created_at, _, stored in rows
+            ], dtype=np.float64)
+            yield X, np.array([row[5] for row in rows], dtype=np.float64)
+    finally:
+        db.close()
+
+class TrainingStatistics:
+    """
+    Sufficient statistics of a least-squares fit with intercept: A^T A and A^T y
+    for A = [1, X]. Chunks are added one at a time, so memory is O(features^2)
+    whatever the number of rows. Rows are shifted by the first chunk's column
+    means, which keeps A^T A well conditioned without a second pass.
+    """
+
+    def __init__(self, n_features: int = len(FEATURES)):
+        self.gram = np.zeros((n_features + 1, n_features + 1))
+        self.xty = np.zeros(n_features + 1)
+        self.shift = None
+        self.rows = 0
+        self.source_rows = {}
+
+    def add(self, X, y, source: str = "csv"):
+        if len(y) == 0:
+            return
+        if self.shift is None:
+            self.shift = X.mean(axis=0)
+        design = np.empty((len(y), X.shape[1] + 1))
+        design[:, 0] = 1.0
+        design[:, 1:] = X - self.shift
+        self.gram += design.T @ design
+        self.xty += design.T @ y
+        self.rows += len(y)
+        self.source_rows[source] = self.source_rows.get(source, 0) + len(y)
+
+    def gram_unshifted(self):
+        """A^T A in the original feature coordinates"""
+        n_params = self.gram.shape[0]
+        # [1, x] = T [1, x - shift] with T lower triangular
+        transform = np.eye(n_params)
+        transform[1:, 0] = self.shift if self.shift is not None else 0.0
+        return transform @ self.gram @ transform.T
+
+    def solve(self):
+        """(coefficients, intercept) of the least-squares fit"""
+        if self.rows == 0:
+            raise ValueError("No training rows")
+        theta = np.linalg.lstsq(self.gram, self.xty, rcond=None)[0]
+        coefficients = theta[1:]
+        return coefficients, float(theta[0] - coefficients @ self.shift)
+
+def training_statistics(path: str = TRAINING_FILE, include_feedback: bool = True) -> TrainingStatistics:
+    """Accumulate the training CSV and (optionally) the exam feedback rows"""
+    if not os.path.exists(path):
         # Create sample data
         data = create_training_data()
-        os.makedirs(os.path.dirname(training_file), exist_ok=True)
-        data.to_csv(training_file, index=False)
-    
-    # Prepare features
-    X = data[["past_score", "difficulty_level", "chapters", "days_left"]]
-    y = data["recommended_hours"]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data.to_csv(path, index=False)
     
-    # Train model
-    model = LinearRegression()
-    model.fit(X, y)
-    
-    # Save model
-    with open(MODEL_PATH, "wb") as f:
-        pickle.dump(model, f)
+    statistics = TrainingStatistics()
+    for X, y in csv_training_chunks(path):
+        statistics.add(X, y)
+    if not include_feedback:
+        return statistics
+    try:
+        for X, y in exam_training_chunks():
+            statistics.add(X, y, "exam_feedback")
+    except Exception as e:
+        # A missing or locked database must not stop training on the CSV
+        print(f"Error reading exam feedback for training: {e}")
+    return statistics
+
+def train_and_publish() -> dict:
+    """Fit the model on the training data and publish it; returns the stored document"""
+    started = time.monotonic()
+    # Feedback recorded before this is in the training data; online learners drop their copy
+    started_at = datetime.utcnow().isoformat()
+    statistics = training_statistics()
+    coefficients, intercept = statistics.solve()
     
+    # Publish model
+    model_data = export_coefficients(coefficients, intercept, statistics.rows)
+    model_data["training_sources"] = statistics.source_rows
+    # A^T A of exactly these rows, so online learning starts from the same statistics
+    model_data["training_gram"] = statistics.gram_unshifted().tolist()
+    model_data["training_seconds"] = round(time.monotonic() - started, 4)
+    model_data["training_started_at"] = started_at
+    return publish_model(model_data, source="train")
+
+def train_model():
+    """Train the ML model"""
+    train_and_publish()
     return "Model trained successfully!"
 
+class ModelNotReady(Exception):
+    """No model version exists yet; job is the background training job that will publish one"""
+
+    def __init__(self, job: dict):
+        super().__init__(job.get("error") or "The study hours model is still being trained, retry shortly")
+        self.job = job
+
 def load_model():
-    """Load the trained model"""
-    if not os.path.exists(MODEL_PATH):
-        train_model()
-    
-    with open(MODEL_PATH, "rb") as f:
-        model = pickle.load(f)
-    return model
+    """
+    Load the active model document from the registry. Before the first version
+    exists, a training job is started in the background (never inside the request)
+    and ModelNotReady is raised until it has published.
+    """
+    model_data = model_registry.load_active_model()
+    if model_data is None:
+        if not os.path.exists(LEGACY_MODEL_PATH):
+            from app.services.training_jobs import training_jobs
+            raise ModelNotReady(training_jobs.submit())
+        with open(LEGACY_MODEL_PATH) as f:
+            model_data = model_registry.publish_model(validate_model(json.load(f)), source="legacy")
+    return validate_model(model_data)
+
+class ModelHolder:
+    """
+    Process-wide resident model. It is loaded once and replaced atomically after
+    training; other workers (and the training process) move the registry pointer,
+    and the model is reloaded when the pointer file's mtime changes.
+    Readers take a snapshot without locking, so predictions never wait on a reload.
+    """
+
+    def __init__(self, path: str = model_registry.POINTER_PATH, check_interval: float = MODEL_RELOAD_CHECK_SECONDS):
+        self.path = path
+        self.check_interval = check_interval
+        self._state = None  # (coefficients, intercept, model, mtime)
+        self._next_check = 0.0
+        self._lock = threading.RLock()  # a training job started by load_model may finish and reload inline
+        self.loads = 0
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _snapshot(self, model_data, mtime):
+        return (list(model_data["coefficients"]), model_data["intercept"], model_data, mtime)
+
+    def get(self):
+        """Current (coefficients, intercept, model, mtime) snapshot"""
+        state = self._state
+        now = time.monotonic()
+        if state is not None and now < self._next_check:
+            return state
+        with self._lock:
+            state = self._state
+            if state is None or time.monotonic() >= self._next_check:
+                mtime = self._file_mtime()
+                if state is None or mtime != state[3]:
+                    model = load_model()
+                    # Stat taken before loading: a file replaced meanwhile just reloads again
+                    state = self._snapshot(model, mtime if mtime is not None else self._file_mtime())
+                    self._state = state
+                    self.loads += 1
+                self._next_check = time.monotonic() + self.check_interval
+            return state
+
+    def reload(self):
+        """Load the active registry version now instead of at the next mtime check"""
+        with self._lock:
+            mtime = self._file_mtime()
+            self._state = self._snapshot(load_model(), mtime)
+            self._next_check = time.monotonic() + self.check_interval
+            self.loads += 1
+
+    def swap(self, model_data):
+        """Install a freshly published model (the pointer is already moved)"""
+        with self._lock:
+            self._state = self._snapshot(model_data, self._file_mtime())
+            self._next_check = time.monotonic() + self.check_interval
+            self.loads += 1
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "loaded": state is not None,
+            "loads": self.loads,
+            "coefficients": dict(zip(FEATURES, state[0])) if state else None,
+            "intercept": state[1] if state else None,
+            "model_version": state[2].get("model_version") if state else None,
+            "trained_at": state[2].get("trained_at") if state else None,
+            "training_rows": state[2].get("training_rows") if state else None
+        }
+
+model_holder = ModelHolder()
+
+def get_model():
+    """The resident trained model document"""
+    return model_holder.get()[2]
+
+DIFFICULTY_LEVELS = {"easy": 0, "medium": 1, "hard": 2}
 
 def predict_hours(past_score: float, difficulty: str, chapters: int, days_left: int) -> float:
     """
     Predict recommended study hours based on features
     """
     # Convert difficulty to numeric
-    difficulty_map = {"easy": 0, "medium": 1, "hard": 2}
-    difficulty_level = difficulty_map.get(difficulty.lower(), 1)
+    difficulty_level = DIFFICULTY_LEVELS.get(difficulty.lower(), 1)
     
-    # Load model
-    model = load_model()
-    
-    # Make prediction
-    features = np.array([[past_score, difficulty_level, chapters, days_left]])
-    prediction = model.predict(features)
+    # Linear model: the prediction is a dot product with the resident coefficients
+    coefficients, intercept, _, _ = model_holder.get()
+    features = (past_score, difficulty_level, chapters, days_left)
+    prediction = intercept + sum(c * x for c, x in zip(coefficients, features))
     
     # Ensure minimum 1 hour
-    return max(1.0, round(float(prediction[0]), 2))
-
-def update_model_with_feedback(past_score: float, difficulty: str, chapters: int, 
-                               days_left: int, actual_hours: float):
-    """Update model with user feedback (optional enhancement)"""
-    # This would append to training data and retrain
-    # For now, just a placeholder
-    pass
+    return max(1.0, round(float(prediction), 2))
+
+def predict_hours_batch(past_scores, difficulty_levels, chapters, days_left) -> list:
+    """
+    Vectorized predict_hours over equal-length feature columns (difficulty already
+    numeric). Terms are accumulated in the same order as predict_hours, so every
+    row gets exactly the value a single prediction would return.
+    """
+    coefficients, intercept, _, _ = model_holder.get()
+    columns = (past_scores, difficulty_levels, chapters, days_left)
+    total = None
+    for coefficient, column in zip(coefficients, columns):
+        term = coefficient * np.asarray(column, dtype=np.float64)
+        total = term if total is None else total + term
+    predictions = intercept + total
+    return [max(1.0, round(value, 2)) for value in predictions.tolist()]
+
+def feedback_features(past_score: float, difficulty: str, chapters: int, days_left: int) -> list:
+    """Feature vector (in FEATURES order) of an exam's feedback observation"""
+    return [
+        float(past_score or 0.0),
+        float(DIFFICULTY_LEVELS.get((difficulty or "").lower(), 1)),
+        float(chapters or 0),
+        float(days_left)
+    ]
+
+def update_model_with_feedback(features, actual_hours: float, previous_features=None, previous_hours: float = None):
+    """
+    Update the model online with the hours actually studied for one exam's features.
+    previous_features and previous_hours are the observation absorbed earlier for
+    the same exam, which is replaced.
+    """
+    from app.services.online_learner import online_learner
+    
+    return online_learner.update(features, actual_hours, previous_features, previous_hours)
 
@@ -0,0 +1,198 @@
+"""
+Model Registry
+Every trained (or online-updated) model is written once as an immutable,
+versioned artifact next to a SHA-256 checksum file, and published by atomically
+replacing a small pointer file. Readers only ever follow the pointer, so they see
+either the previous model or the new one, never a partially written file, and
+any earlier version can be re-activated.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Runtime model state (registry versions and training job records)
+# lives outside the source package; point MODEL_DATA_DIR at a persistent volume
+MODEL_DATA_DIR = os.path.abspath(
+    os.environ.get("MODEL_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "model_data"))
+)
+REGISTRY_DIR = os.path.join(MODEL_DATA_DIR, "model_registry")
+POINTER_PATH = os.path.join(REGISTRY_DIR, "current.json")
+PUBLISH_LOCK_PATH = os.path.join(REGISTRY_DIR, "publish.lock")
+# Versions kept on disk besides the active one: trained (or imported) versions and
+# online checkpoints are counted separately, so frequent checkpoints never push out
+# the trained versions they started from
+MODEL_VERSIONS_KEPT = int(os.environ.get("MODEL_VERSIONS_KEPT", "20"))
+MODEL_ONLINE_VERSIONS_KEPT = int(os.environ.get("MODEL_ONLINE_VERSIONS_KEPT", "10"))
+
+_ARTIFACT_PATTERN = re.compile(r"^model-v(\d+)\.json$")
+_lock = threading.Lock()
+
+def _artifact_path(version: int) -> str:
+    return os.path.join(REGISTRY_DIR, f"model-v{version:05d}.json")
+
+def _checksum_path(version: int) -> str:
+    return _artifact_path(version) + ".sha256"
+
+def _existing_versions():
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    versions = []
+    for name in os.listdir(REGISTRY_DIR):
+        match = _ARTIFACT_PATTERN.match(name)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+def _write_atomic(path: str, content: bytes):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def read_pointer():
+    """The active version's pointer record, or None before anything is published"""
+    try:
+        with open(POINTER_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def read_version(version: int) -> dict:
+    """Load one artifact after verifying it against its checksum file"""
+    with open(_artifact_path(version), "rb") as f:
+        content = f.read()
+    with open(_checksum_path(version)) as f:
+        expected = f.read().strip()
+    if hashlib.sha256(content).hexdigest() != expected:
+        raise ValueError(f"Checksum mismatch for model version {version}")
+    return json.loads(content)
+
+def load_active_model():
+    """The active model document, or None if no version has been published"""
+    pointer = read_pointer()
+    if pointer is None:
+        return None
+    return read_version(pointer["version"])
+
+@contextmanager
+def _publish_lock():
+    """Serialises publishing and activation across threads and worker processes"""
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    with _lock, open(PUBLISH_LOCK_PATH, "a") as f:
+        # Released when the file is closed, including when the process dies
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+def _set_pointer(version: int, sha256: str):
+    pointer = {"version": version, "sha256": sha256, "activated_at": datetime.utcnow().isoformat()}
+    _write_atomic(POINTER_PATH, json.dumps(pointer).encode("utf-8"))
+
+def _publish_locked(model_data: dict, source: str) -> dict:
+    version = (max(_existing_versions(), default=0)) + 1
+    while True:
+        document = dict(model_data, model_version=version, source=source, published_at=datetime.utcnow().isoformat())
+        content = json.dumps(document, indent=2).encode("utf-8")
+        try:
+            with open(_artifact_path(version), "xb") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            break
+        except FileExistsError:
+            version += 1
+    sha256 = hashlib.sha256(content).hexdigest()
+    _write_atomic(_checksum_path(version), sha256.encode("utf-8"))
+    _set_pointer(version, sha256)
+    return document
+
+def publish_model(model_data: dict, source: str = "train") -> dict:
+    """
+    Write model_data as the next version and make it active.
+    The artifact is created exclusively, so concurrent publishers (threads or
+    training processes) never share a version number. Returns the stored document.
+    """
+    with _publish_lock():
+        document = _publish_locked(model_data, source)
+    delete_old_versions()
+    return document
+
+def publish_merged(merge, source: str = "online") -> dict:
+    """
+    Publish merge(active document) as the next version. The active version is read
+    under the publish lock, so a change one worker folds into it is never
+    overwritten by another worker publishing from an older version.
+    merge receives None before the first version exists.
+    """
+    with _publish_lock():
+        document = _publish_locked(merge(load_active_model()), source)
+    delete_old_versions()
+    return document
+
+def activate_version(version: int) -> dict:
+    """Roll back (or forward) to a stored version; returns its document"""
+    with _publish_lock():
+        document = read_version(version)
+        with open(_checksum_path(version)) as f:
+            _set_pointer(version, f.read().strip())
+    return document
+
+def list_versions():
+    """Stored versions, newest first, with their training metadata"""
+    pointer = read_pointer()
+    active = pointer["version"] if pointer else None
+    versions = []
+    for version in reversed(_existing_versions()):
+        entry = {"version": version, "active": version == active}
+        try:
+            document = read_version(version)
+            entry.update({
+                "source": document.get("source"),
+                "trained_at": document.get("trained_at"),
+                "training_rows": document.get("training_rows"),
+                "published_at": document.get("published_at"),
+                "online_updates": document.get("online_updates", 0),
+                "valid": True
+            })
+        except (OSError, ValueError) as e:
+            entry.update({"valid": False, "error": str(e)})
+        versions.append(entry)
+    return versions
+
+def _version_source(version: int):
+    try:
+        with open(_artifact_path(version)) as f:
+            return json.load(f).get("source")
+    except (OSError, ValueError):
+        return None
+
+def delete_old_versions(keep: int = MODEL_VERSIONS_KEPT, online_keep: int = MODEL_ONLINE_VERSIONS_KEPT) -> int:
+    """
+    Remove all but the newest `keep` trained versions and the newest `online_keep`
+    online checkpoints (unreadable artifacts are pruned with the checkpoints).
+    The active version is always kept.
+    """
+    pointer = read_pointer()
+    active = pointer["version"] if pointer else None
+    trained, online = [], []
+    for version in _existing_versions():
+        (online if _version_source(version) in ("online", None) else trained).append(version)
+    
+    removed = 0
+    for versions, kept in ((trained, keep), (online, online_keep)):
+        for version in versions[:-kept] if kept > 0 else versions:
+            if version == active:
+                continue
+            for path in (_artifact_path(version), _checksum_path(version)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed += 1
+    return removed
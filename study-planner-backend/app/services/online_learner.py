@@ -0,0 +1,221 @@
+"""
+Online Learning from Feedback
+Recursive least squares (RLS) over the linear study-hours model. Each observed
+(features, actual_hours) pair updates the coefficients in O(features^2), and the
+resident model is swapped immediately, so feedback improves predictions without
+rereading the training data or refitting.
+
+The state is built from the current model and the Gram matrix stored with it,
+made from exactly the rows (CSV and exam feedback) the model was fitted on, so
+with no forgetting the result equals a least-squares refit on those rows plus all
+later feedback. Pending feedback is published as a new model version every few
+updates or seconds. Each API worker learns on its own: publishing re-reads the
+latest version under the registry's publish lock and folds this worker's pending
+observations into its Gram matrix, so a version published meanwhile by another
+worker is extended rather than replaced, and neither worker's feedback is lost.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from app.services import ml_model
+
+# 1.0 weighs all observations equally; < 1.0 gradually forgets older ones
+RLS_FORGETTING = float(os.environ.get("RLS_FORGETTING", "1.0"))
+# Initial uncertainty when the training data is not available
+RLS_INITIAL_VARIANCE = 1000.0
+ONLINE_CHECKPOINT_EVERY = int(os.environ.get("ONLINE_CHECKPOINT_EVERY", "10"))
+ONLINE_CHECKPOINT_SECONDS = float(os.environ.get("ONLINE_CHECKPOINT_SECONDS", "60"))
+
+def _training_gram(model_data, n_params: int):
+    """A^T A for the rows behind model_data's coefficients with an intercept column, or None"""
+    gram = model_data.get("training_gram")
+    if gram is None:
+        # Published before the Gram matrix was stored: rebuild it from the same sources
+        if not os.path.exists(ml_model.TRAINING_FILE):
+            return None
+        include_feedback = "exam_feedback" in (model_data.get("training_sources") or {})
+        statistics = ml_model.training_statistics(include_feedback=include_feedback)
+        if statistics.rows == 0:
+            return None
+        gram = statistics.gram_unshifted()
+    gram = np.array(gram, dtype=np.float64)
+    if gram.shape != (n_params, n_params):
+        return None
+    return gram
+
+def _inverse(gram):
+    # A tiny ridge keeps the inverse finite when the rows are degenerate
+    return np.linalg.inv(gram + 1e-9 * np.eye(len(gram)))
+
+class RLSLearner:
+    """Thread-safe recursive least squares learner bound to the resident model"""
+
+    def __init__(self, forgetting: float = RLS_FORGETTING):
+        self.forgetting = forgetting
+        self._lock = threading.Lock()
+        self._theta = None  # [intercept, coefficients...]
+        self._P = None
+        self._gram = None  # inverse of P, published with each version
+        self._base = None  # Published version the state was built on
+        self._current = None  # Model document this learner last installed
+        self._observations = []  # Unpublished (x, hours, +1 added / -1 removed, recorded_at)
+        self._timer = None
+        self.updates = 0
+        self._pending = 0
+
+    def _rebase(self, model_data):
+        """
+        Build the state on model_data (first use, or a version published since by
+        training, a rollback or another worker) and replay this worker's unpublished
+        observations onto it. Those recorded before a trained version started reading
+        its data are already part of it and are dropped.
+        """
+        started_at = model_data.get("training_started_at") if model_data.get("source") == "train" else None
+        if started_at:
+            started_at = datetime.fromisoformat(started_at)
+            self._observations = [o for o in self._observations if o[3] >= started_at]
+
+        theta = np.array([model_data["intercept"]] + list(model_data["coefficients"]), dtype=np.float64)
+        n_params = theta.size
+        gram = None
+        try:
+            gram = _training_gram(model_data, n_params)
+        except Exception as e:
+            print(f"Error reading training data for online learner: {e}")
+        if gram is None:
+            gram = np.eye(n_params) / RLS_INITIAL_VARIANCE
+        # The fitted coefficients solve the normal equations, so A^T y = A^T A theta
+        xty = gram @ theta
+        for x, hours, weight, _ in self._observations:
+            if weight > 0:
+                gram = self.forgetting * gram + np.outer(x, x)
+                xty = self.forgetting * xty + x * hours
+            else:
+                gram = gram - np.outer(x, x)
+                xty = xty - x * hours
+
+        self._gram = gram
+        self._P = _inverse(gram)
+        self._theta = self._P @ xty if self._observations else theta
+        self._base = model_data
+        self._pending = sum(1 for o in self._observations if o[2] > 0)
+        self.updates = model_data.get("online_updates", 0) + self._pending
+
+    def _install(self):
+        """Make the current coefficients resident in this worker"""
+        self._current = dict(
+            self._base,
+            intercept=float(self._theta[0]),
+            coefficients=[float(c) for c in self._theta[1:]],
+            online_updates=self.updates
+        )
+        ml_model.model_holder.swap(self._current)
+
+    def update(self, features, actual_hours: float, previous_features=None, previous_hours: float = None) -> dict:
+        """
+        Absorb one observation and install the updated coefficients. When the same
+        exam was observed before (previous_features with previous_hours), that
+        observation is removed first (an RLS downdate), so a corrected value replaces it.
+        """
+        with self._lock:
+            model_data = ml_model.model_holder.get()[2]
+            if self._theta is None or model_data is not self._current:
+                self._rebase(model_data)
+
+            recorded_at = datetime.utcnow()
+            x = np.array([1.0] + [float(value) for value in features], dtype=np.float64)
+            if previous_hours is not None:
+                previous = features if previous_features is None else previous_features
+                x_previous = np.array([1.0] + [float(value) for value in previous], dtype=np.float64)
+                if self._downdate(x_previous, previous_hours):
+                    self._observations.append((x_previous, float(previous_hours), -1, recorded_at))
+            Px = self._P @ x
+            gain = Px / (self.forgetting + x @ Px)
+            error = float(actual_hours) - float(x @ self._theta)
+            self._theta = self._theta + gain * error
+            self._P = (self._P - np.outer(gain, Px)) / self.forgetting
+            self._gram = self.forgetting * self._gram + np.outer(x, x)
+            self._observations.append((x, float(actual_hours), 1, recorded_at))
+            self.updates += 1
+            self._pending += 1
+            self._install()
+
+            if self._pending >= ONLINE_CHECKPOINT_EVERY:
+                self._publish()
+            elif self._timer is None:
+                self._schedule()
+
+            return {"prediction_error": error, "updates": self.updates}
+
+    def _downdate(self, x, observed_hours: float) -> bool:
+        """
+        Remove an earlier observation (x, observed_hours) from the state. Exact when
+        nothing is forgotten; with forgetting < 1 the observation is removed at full
+        weight, which slightly over-corrects for older feedback.
+        """
+        Px = self._P @ x
+        denominator = 1.0 - x @ Px
+        if denominator <= 1e-12:
+            # The observation alone pins down this direction; it cannot be removed
+            print("Error downdating online learner: observation cannot be removed")
+            return False
+        self._P = self._P + np.outer(Px, Px) / denominator
+        self._theta = self._theta - (self._P @ x) * (float(observed_hours) - float(x @ self._theta))
+        self._gram = self._gram - np.outer(x, x)
+        return True
+
+    def _schedule(self):
+        # Pending feedback is published within ONLINE_CHECKPOINT_SECONDS even if no more arrives
+        self._timer = threading.Timer(ONLINE_CHECKPOINT_SECONDS, self.checkpoint)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _publish(self):
+        def merge(active):
+            if active is None:
+                raise ValueError("No active model version to publish onto")
+            if active.get("model_version") != self._base.get("model_version"):
+                # Another worker, a training job or a rollback published since the state was built
+                self._rebase(active)
+            # Each version is a checkpoint that can be rolled back; its Gram matrix
+            # covers the training rows plus all feedback absorbed so far
+            return dict(
+                active,
+                intercept=float(self._theta[0]),
+                coefficients=[float(c) for c in self._theta[1:]],
+                training_gram=self._gram.tolist(),
+                online_updates=self.updates
+            )
+
+        try:
+            document = ml_model.publish_merged_model(merge, source="online")
+            self._base = self._current = document
+            self._observations = []
+            self._pending = 0
+        except Exception as e:
+            print(f"Error checkpointing online learner: {e}")
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            self._schedule()
+
+    def checkpoint(self):
+        """Publish pending updates now (on the timer and on shutdown)"""
+        with self._lock:
+            if self._pending and self._theta is not None:
+                self._publish()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "updates": self.updates,
+                "pending_checkpoint": self._pending,
+                "forgetting": self.forgetting,
+                "base_trained_at": self._base.get("trained_at") if self._base else None,
+                "model_version": self._current.get("model_version") if self._current else None
+            }
+
+online_learner = RLSLearner()
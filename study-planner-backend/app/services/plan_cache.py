@@ -0,0 +1,87 @@
+"""
+Content-Addressed Plan Cache
+generate_study_plan is deterministic given the assignments, exams, hours per day,
+start/end dates and today's date, so generated plans are cached under a stable hash
+of those inputs. The same hash is stored on each saved plan version, so a repeat
+request whose key matches the active version skips both scheduling and the
+database rewrite, whichever worker wrote that version.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# Fields generate_study_plan actually reads from each row
+ASSIGNMENT_FIELDS = ("id", "name", "subject_name", "due_date", "estimated_hours", "priority")
+EXAM_FIELDS = ("id", "name", "subject_name", "exam_date", "recommended_hours", "priority")
+
+PLAN_CACHE_SIZE = int(os.environ.get("PLAN_CACHE_SIZE", "32"))
+
+def _row_fields(row, fields):
+    if isinstance(row, dict):
+        return [row.get(field) for field in fields]
+    return [getattr(row, field, None) for field in fields]
+
+def compute_plan_key(assignments, exams, available_hours_per_day: float, start_date: str, end_date: str, today: str = None):
+    """Stable SHA-256 over every input that determines the generated plan"""
+    payload = {
+        # Row order is kept: it breaks ties when items are ranked
+        "assignments": [_row_fields(a, ASSIGNMENT_FIELDS) for a in assignments],
+        "exams": [_row_fields(e, EXAM_FIELDS) for e in exams],
+        "available_hours_per_day": float(available_hours_per_day),
+        "start_date": start_date,
+        "end_date": end_date,
+        "today": today or datetime.now().strftime("%Y-%m-%d")
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class PlanCache:
+    """Size-bounded LRU cache of generated plans with hit/miss counters"""
+
+    def __init__(self, max_size: int = PLAN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.persist_skips = 0
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, plan_result: dict):
+        with self._lock:
+            self._entries[key] = plan_result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_persist_skip(self):
+        with self._lock:
+            self.persist_skips += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "persist_skips": self.persist_skips
+            }
+
+plan_cache = PlanCache()
@@ -8,79 +8,80 @@ from app.models.database import Assignment, Exam, Reminder
 from app.models import subject as subject_model
 
 
+ASSIGNMENT_REMINDER_DAYS = 3
+EXAM_REMINDER_DAYS = 7
+EXAM_URGENT_DAYS = 3
+
+
 def generate_automatic_reminders(db: Session):
     """
     Automatically generate reminders for:
     - Exams within 7 days
     - Assignments due within 3 days
     - Exams within 3 days (urgent)
+    Only rows dated in [today, today + 7] are read, through indexed range queries
+    (dates are stored as zero-padded YYYY-MM-DD strings, so they sort by date).
     """
-    reminders_created = []
     today = datetime.now().date()
+    today_str = today.isoformat()
     
-    # Get all assignments
-    assignments = db.query(Assignment).all()
+    candidates = []
+    
+    # Assignments due within the reminder window
+    assignments = db.query(Assignment).filter(
+        Assignment.due_date.between(today_str, (today + timedelta(days=ASSIGNMENT_REMINDER_DAYS)).isoformat())
+    ).order_by(Assignment.id).all()
     for assignment in assignments:
-        if assignment.due_date:
-            try:
-                due_date = datetime.strptime(assignment.due_date, "%Y-%m-%d").date()
-                days_until = (due_date - today).days
-                
-                # Create reminder if due within 3 days
-                if 0 <= days_until <= 3:
-                    message = f"Assignment '{assignment.name}' is due in {days_until} day(s) ({assignment.due_date})"
-                    reminder_data = {
-                        "subject_id": None,  # Assignments don't have subject_id directly
-                        "message": message,
-                        "reminder_date": assignment.due_date,
-                        "is_read": False
-                    }
-                    
-                    # Check if reminder already exists
-                    existing = db.query(Reminder).filter(
-                        Reminder.message == message,
-                        Reminder.is_read == False
-                    ).first()
-                    
-                    if not existing:
-                        reminder = subject_model.create_reminder(db, reminder_data)
-                        reminders_created.append(message)
-            except Exception as e:
-                print(f"Error processing assignment reminder: {e}")
+        try:
+            due_date = datetime.strptime(assignment.due_date, "%Y-%m-%d").date()
+            days_until = (due_date - today).days
+            candidates.append({
+                "subject_id": None,  # Assignments don't have subject_id directly
+                "message": f"Assignment '{assignment.name}' is due in {days_until} day(s) ({assignment.due_date})",
+                "reminder_date": assignment.due_date,
+                "is_read": False
+            })
+        except Exception as e:
+            print(f"Error processing assignment reminder: {e}")
     
-    # Get all exams
-    exams = db.query(Exam).all()
+    # Exams within the reminder window
+    exams = db.query(Exam).filter(
+        Exam.exam_date.between(today_str, (today + timedelta(days=EXAM_REMINDER_DAYS)).isoformat())
+    ).order_by(Exam.id).all()
     for exam in exams:
-        if exam.exam_date:
-            try:
-                exam_date = datetime.strptime(exam.exam_date, "%Y-%m-%d").date()
-                days_until = (exam_date - today).days
-                
-                # Create reminders for exams
-                if 0 <= days_until <= 7:
-                    if days_until <= 3:
-                        message = f"⚠️ URGENT: Exam '{exam.name}' is in {days_until} day(s) ({exam.exam_date})"
-                    else:
-                        message = f"Exam '{exam.name}' is in {days_until} day(s) ({exam.exam_date})"
-                    
-                    reminder_data = {
-                        "subject_id": None,
-                        "message": message,
-                        "reminder_date": exam.exam_date,
-                        "is_read": False
-                    }
-                    
-                    # Check if reminder already exists
-                    existing = db.query(Reminder).filter(
-                        Reminder.message == message,
-                        Reminder.is_read == False
-                    ).first()
-                    
-                    if not existing:
-                        reminder = subject_model.create_reminder(db, reminder_data)
-                        reminders_created.append(message)
-            except Exception as e:
-                print(f"Error processing exam reminder: {e}")
+        try:
+            exam_date = datetime.strptime(exam.exam_date, "%Y-%m-%d").date()
+            days_until = (exam_date - today).days
+            if days_until <= EXAM_URGENT_DAYS:
+                message = f"⚠️ URGENT: Exam '{exam.name}' is in {days_until} day(s) ({exam.exam_date})"
+            else:
+                message = f"Exam '{exam.name}' is in {days_until} day(s) ({exam.exam_date})"
+            candidates.append({
+                "subject_id": None,
+                "message": message,
+                "reminder_date": exam.exam_date,
+                "is_read": False
+            })
+        except Exception as e:
+            print(f"Error processing exam reminder: {e}")
     
-    return reminders_created
-
+    if not candidates:
+        return []
+    
+    # One lookup for unread reminders already raised in the window
+    existing = {
+        message for (message,) in db.query(Reminder.message).filter(
+            Reminder.reminder_date.between(today_str, (today + timedelta(days=EXAM_REMINDER_DAYS)).isoformat()),
+            Reminder.is_read == False
+        )
+    }
+    
+    new_reminders = []
+    for reminder_data in candidates:
+        if reminder_data["message"] not in existing:
+            existing.add(reminder_data["message"])
+            new_reminders.append(reminder_data)
+    
+    subject_model.bulk_create_reminders(db, new_reminders)
+    
+    return [reminder_data["message"] for reminder_data in new_reminders]
@@ -0,0 +1,90 @@
+"""
+Conditional GET and Response Cache
+List endpoints are served through conditional_response: a request whose
+If-None-Match matches the current ETag gets a 304 after a single read of the
+resource version counters, and otherwise the serialized body is reused from a
+small LRU cache for as long as the ETag (derived from those counters) stays the same.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.models import resource_versions
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "64"))
+
+class ResponseCache:
+    """Size-bounded LRU of serialized responses keyed by URL, valid for one ETag"""
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # url -> (etag, body, headers)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: str, etag: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, key: str, etag: str, body: bytes, headers: dict):
+        with self._lock:
+            self._entries[key] = (etag, body, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "versions": resource_versions.get_all_versions()
+            }
+
+response_cache = ResponseCache()
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def conditional_response(request: Request, resources, build) -> Response:
+    """
+    Serve a GET whose body depends only on the given resources.
+    build() returns (data, headers) and is only called when neither the client nor
+    the cache holds the current version.
+    """
+    # Taken before building, so a write that lands mid-build only costs a rebuild
+    etag = resource_versions.get_etag(*resources)
+    if _etag_matches(request, etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers={"ETag": etag})
+
+    key = request.url.path + "?" + request.url.query
+    entry = response_cache.get(key, etag)
+    if entry is None:
+        data, headers = build()
+        body = json.dumps(jsonable_encoder(data)).encode("utf-8")
+        response_cache.put(key, etag, body, headers)
+    else:
+        _, body, headers = entry
+    return Response(content=body, media_type="application/json", headers={**headers, "ETag": etag})
@@ -0,0 +1,108 @@
+"""
+Notification and Reminder Retention
+Clash and reminder messages embed day counts, so the same clash or deadline is
+raised again with new wording every day and old rows pile up. The retention job
+deletes notifications and reminders past their TTL in bounded batches, then runs
+an incremental VACUUM so the freed pages are returned to the filesystem. The
+report of each run is stored with the job's row in job_runs.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.models.database import engine, Notification, Reminder
+
+NOTIFICATION_READ_TTL_DAYS = int(os.environ.get("NOTIFICATION_READ_TTL_DAYS", "30"))
+NOTIFICATION_UNREAD_TTL_DAYS = int(os.environ.get("NOTIFICATION_UNREAD_TTL_DAYS", "90"))
+REMINDER_READ_TTL_DAYS = int(os.environ.get("REMINDER_READ_TTL_DAYS", "30"))
+REMINDER_UNREAD_TTL_DAYS = int(os.environ.get("REMINDER_UNREAD_TTL_DAYS", "90"))
+
+# Rows deleted per transaction, and batches per table per run
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_MAX_BATCHES = int(os.environ.get("RETENTION_MAX_BATCHES", "100"))
+# Free pages handed back to the filesystem per run
+VACUUM_MAX_PAGES = int(os.environ.get("VACUUM_MAX_PAGES", "10000"))
+
+def get_retention_policy() -> dict:
+    return {
+        "notification_read_ttl_days": NOTIFICATION_READ_TTL_DAYS,
+        "notification_unread_ttl_days": NOTIFICATION_UNREAD_TTL_DAYS,
+        "reminder_read_ttl_days": REMINDER_READ_TTL_DAYS,
+        "reminder_unread_ttl_days": REMINDER_UNREAD_TTL_DAYS,
+        "batch_size": RETENTION_BATCH_SIZE,
+        "max_batches": RETENTION_MAX_BATCHES,
+        "vacuum_max_pages": VACUUM_MAX_PAGES
+    }
+
+def delete_expired(db: Session, model, is_read: bool, ttl_days: int, now: datetime = None):
+    """
+    Delete rows of model with the given read state created more than ttl_days ago,
+    RETENTION_BATCH_SIZE rows per transaction so writers are never blocked for long.
+    The (is_read, created_at) index finds each batch. Returns the rows deleted.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=ttl_days)
+    deleted = 0
+    for _ in range(RETENTION_MAX_BATCHES):
+        ids = [row_id for (row_id,) in db.query(model.id).filter(
+            model.is_read == is_read,
+            model.created_at < cutoff
+        ).limit(RETENTION_BATCH_SIZE)]
+        if not ids:
+            break
+        deleted += db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        if len(ids) < RETENTION_BATCH_SIZE:
+            break
+    return deleted
+
+def incremental_vacuum(max_pages: int = VACUUM_MAX_PAGES) -> dict:
+    """
+    Return up to max_pages free pages to the filesystem. Only databases in
+    incremental auto_vacuum mode are compacted; an older database is left alone
+    until migrate_db.py converts it (a full VACUUM, never run from here).
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        incremental = conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2  # 2 = INCREMENTAL
+        free_before = conn.execute(text("PRAGMA freelist_count")).scalar()
+        if incremental:
+            conn.execute(text(f"PRAGMA incremental_vacuum({int(max_pages)})"))
+        free_after = conn.execute(text("PRAGMA freelist_count")).scalar()
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+    return {
+        "incremental_auto_vacuum": incremental,
+        "pages_reclaimed": free_before - free_after,
+        "bytes_reclaimed": (free_before - free_after) * page_size,
+        "free_pages_left": free_after
+    }
+
+def run_retention(db: Session) -> dict:
+    """Apply the retention policy to notifications and reminders, then vacuum"""
+    started = time.time()
+    now = datetime.utcnow()
+    deleted = {
+        "notifications_read": delete_expired(db, Notification, True, NOTIFICATION_READ_TTL_DAYS, now),
+        "notifications_unread": delete_expired(db, Notification, False, NOTIFICATION_UNREAD_TTL_DAYS, now),
+        "reminders_read": delete_expired(db, Reminder, True, REMINDER_READ_TTL_DAYS, now),
+        "reminders_unread": delete_expired(db, Reminder, False, REMINDER_UNREAD_TTL_DAYS, now)
+    }
+
+    try:
+        vacuum = incremental_vacuum()
+    except Exception as e:
+        print(f"Error running incremental vacuum: {e}")
+        vacuum = {"error": str(e)}
+
+    report = {
+        "ran_at": now.isoformat(),
+        "rows_deleted": deleted,
+        "total_rows_deleted": sum(deleted.values()),
+        "vacuum": vacuum,
+        "duration_seconds": round(time.time() - started, 4)
+    }
+    print(f"DEBUG: Retention removed {report['total_rows_deleted']} rows, reclaimed {vacuum.get('pages_reclaimed', 0)} pages")
+    return report
+
+def run_retention_job(db: Session):
+    report = run_retention(db)
+    return report["total_rows_deleted"], report
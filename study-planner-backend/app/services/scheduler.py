@@ -1,5 +1,7 @@
+import heapq
 from datetime import datetime, timedelta
-from app.utils.date_utils import get_days_until_exam, get_date_range, is_weekend, get_day_name
+from app.utils.date_utils import get_days_until_exam, get_date_range, is_weekend, get_day_name, get_date_ordinal
+from app.services.capacity_matrix import allocate_with_capacity_matrix
 
 def detect_and_handle_clashes(assignments_list, exams_list):
     """
@@ -113,7 +115,187 @@ def detect_and_handle_clashes(assignments_list, exams_list):
     
     return all_items, clash_rearrangements
 
-def generate_study_plan(assignments, exams, available_hours_per_day: float, start_date: str, end_date: str):
+def _parse_deadline_ordinals(all_items):
+    """
+    Parse every item's YYYY-MM-DD deadline once into a day ordinal.
+    Missing or unparseable deadlines map to None (those items never expire).
+    """
+    parsed = {}
+    ordinals = []
+    for item in all_items:
+        deadline = item.get("deadline", "")
+        if deadline not in parsed:
+            parsed[deadline] = get_date_ordinal(deadline)
+            if deadline and parsed[deadline] is None:
+                print(f"DEBUG: Error parsing deadline {deadline}, including item anyway")
+        ordinals.append(parsed[deadline])
+    return ordinals
+
+def _resolve_day_name(date):
+    day_name = get_day_name(date)
+    # Fallback if day_name is invalid
+    if not day_name or day_name == "Unknown":
+        try:
+            date_obj = datetime.strptime(date, "%Y-%m-%d")
+            day_name = date_obj.strftime("%A")
+        except:
+            day_name = "Unknown"
+    return day_name
+
+def allocate_time_slots(all_items, dates, available_hours_per_day: float, time_slots):
+    """
+    Event-driven deadline-aware allocation.
+    all_items must already be sorted by (priority, days until deadline); an item's
+    position in that list is its heap key. Every item enters the heap when the plan
+    window opens, and is dropped lazily when it is popped after its deadline has
+    passed or once it is fully allocated. Each day pops at most one entry per time
+    slot, so the cost is O((days * slots + items) log items) instead of rescanning
+    and re-sorting every item on every day.
+    Produces the same plan as allocate_by_daily_scan.
+    """
+    deadlines = _parse_deadline_ordinals(all_items)
+    hours_allocated_per_item = {item.get("id", i): 0.0 for i, item in enumerate(all_items)}
+
+    # Ranks are already in ascending order, which is a valid heap
+    heap = list(range(len(all_items)))
+
+    study_plan = []
+    for date in dates:
+        current_ordinal = get_date_ordinal(date)
+        day_plan = {
+            "date": date,
+            "day": datetime.fromordinal(current_ordinal).strftime("%A"),
+            "time_slots": []
+        }
+
+        hours_used_today = 0.0
+        slot_index = 0
+        scheduled_today = []
+
+        while heap and hours_used_today < available_hours_per_day and slot_index < len(time_slots):
+            rank = heapq.heappop(heap)
+            deadline = deadlines[rank]
+            if deadline is not None and deadline < current_ordinal:
+                continue  # Deadline passed, never schedulable again
+
+            item = all_items[rank]
+            item_id = item.get("id")
+            remaining_hours = item.get("hours", 0) - hours_allocated_per_item.get(item_id, 0)
+            if remaining_hours <= 0:
+                continue  # Fully allocated
+
+            hours_to_allocate = min(1.0, remaining_hours, available_hours_per_day - hours_used_today)
+            day_plan["time_slots"].append({
+                "time": time_slots[slot_index],
+                "item_id": item_id,
+                "item_name": item.get("name", ""),
+                "category": item.get("category", ""),
+                "subject_name": item.get("subject_name", ""),
+                "hours": hours_to_allocate
+            })
+
+            hours_allocated_per_item[item_id] = hours_allocated_per_item.get(item_id, 0) + hours_to_allocate
+            hours_used_today += hours_to_allocate
+            slot_index += 1
+            scheduled_today.append(rank)
+
+        # An item gets at most one slot per day; re-queue the ones still needing time
+        for rank in scheduled_today:
+            item = all_items[rank]
+            if item.get("hours", 0) - hours_allocated_per_item.get(item.get("id"), 0) > 0:
+                heapq.heappush(heap, rank)
+
+        study_plan.append(day_plan)
+
+    return study_plan
+
+def allocate_by_daily_scan(all_items, dates, available_hours_per_day: float, time_slots):
+    """
+    Reference greedy allocation: rescans and re-sorts every item on every day.
+    Kept for equivalence checks and benchmarks against allocate_time_slots.
+    """
+    priority_order = {"urgent": 0, "high": 1, "medium": 2, "low": 3}
+    study_plan = []
+    hours_allocated_per_item = {item.get("id", i): 0.0 for i, item in enumerate(all_items)}
+
+    for date in dates:
+        day_plan = {
+            "date": date,
+            "day": _resolve_day_name(date),
+            "time_slots": []
+        }
+
+        # Get items that can be scheduled on this date
+        # Assignments: only if due_date is after this date (or same day)
+        # Exams: only if exam_date is after this date (or same day)
+        available_items = []
+        current_date_obj = datetime.strptime(date, "%Y-%m-%d")
+
+        for item in all_items:
+            item_id = item.get("id")
+            remaining_hours = item.get("hours", 0) - hours_allocated_per_item.get(item_id, 0)
+
+            if remaining_hours > 0:
+                deadline = item.get("deadline", "")
+                if deadline:
+                    try:
+                        deadline_date = datetime.strptime(deadline, "%Y-%m-%d")
+                        # Can schedule if deadline is on or after current date
+                        if deadline_date >= current_date_obj:
+                            available_items.append(item)
+                    except Exception:
+                        available_items.append(item)
+                else:
+                    # No deadline, include it
+                    available_items.append(item)
+
+        # Sort available items by priority
+        available_items.sort(key=lambda x: (
+            priority_order.get(x.get("priority", "medium"), 2),
+            get_days_until_exam(x.get("due_date", ""))
+        ))
+
+        hours_used_today = 0.0
+        slot_index = 0
+
+        # Allocate items for this day
+        for item in available_items:
+            if hours_used_today >= available_hours_per_day or slot_index >= len(time_slots):
+                break
+
+            item_id = item.get("id")
+            remaining_hours = item.get("hours", 0) - hours_allocated_per_item.get(item_id, 0)
+
+            if remaining_hours > 0:
+                hours_to_allocate = min(1.0, remaining_hours, available_hours_per_day - hours_used_today)
+
+                slot_data = {
+                    "time": time_slots[slot_index],
+                    "item_id": item_id,
+                    "item_name": item.get("name", ""),
+                    "category": item.get("category", ""),
+                    "subject_name": item.get("subject_name", ""),
+                    "hours": hours_to_allocate
+                }
+                day_plan["time_slots"].append(slot_data)
+
+                hours_allocated_per_item[item_id] = hours_allocated_per_item.get(item_id, 0) + hours_to_allocate
+                hours_used_today += hours_to_allocate
+                slot_index += 1
+
+        study_plan.append(day_plan)
+
+    return study_plan
+
+# Allocation engines selectable through generate_study_plan(engine=...)
+ALLOCATION_ENGINES = {
+    "heap": allocate_time_slots,
+    "matrix": allocate_with_capacity_matrix,
+    "scan": allocate_by_daily_scan
+}
+
+def generate_study_plan(assignments, exams, available_hours_per_day: float, start_date: str, end_date: str,
+                        engine: str = "heap"):
     """
     Generate a deadline-aware study plan with automatic clash resolution:
     - Detects overlapping exams and automatically rearranges study slots
@@ -121,11 +303,16 @@ def generate_study_plan(assignments, exams, available_hours_per_day: float, star
     - After assignment due dates, time can be allocated to exams
     - Exams should be scheduled before their exam dates
     - Rule-based logic rearranges items when clashes are detected
+    engine selects the allocator: "heap" (default), "matrix" (NumPy capacity
+    matrix) or "scan" (reference daily scan). All produce the same plan.
     """
     # Validate inputs
     if available_hours_per_day <= 0:
         raise ValueError("Available hours per day must be greater than 0")
     
+    if engine not in ALLOCATION_ENGINES:
+        raise ValueError(f"Unknown allocation engine '{engine}'. Choose from: {', '.join(ALLOCATION_ENGINES)}")
+    
     if not start_date or not end_date:
         raise ValueError("Start date and end date are required")
     
@@ -213,95 +400,8 @@ def generate_study_plan(assignments, exams, available_hours_per_day: float, star
         time_slots.append(f"{hour:02d}:00-{hour+1:02d}:00")
     
     # Deadline-aware allocation
-    study_plan = []
-    hours_allocated_per_item = {item.get("id", i): 0.0 for i, item in enumerate(all_items)}
-    
     print(f"DEBUG: Starting allocation for {len(dates)} dates with {len(all_items)} items")
-    
-    for date in dates:
-        day_name = get_day_name(date)
-        # Fallback if day_name is invalid
-        if not day_name or day_name == "Unknown":
-            try:
-                date_obj = datetime.strptime(date, "%Y-%m-%d")
-                day_name = date_obj.strftime("%A")
-            except:
-                day_name = "Unknown"
-        
-        day_plan = {
-            "date": date,
-            "day": day_name,
-            "time_slots": []
-        }
-        print(f"DEBUG: Created day_plan for {date} ({day_name})")
-        
-        # Get items that can be scheduled on this date
-        # Assignments: only if due_date is after this date (or same day)
-        # Exams: only if exam_date is after this date (or same day)
-        available_items = []
-        current_date_obj = datetime.strptime(date, "%Y-%m-%d")
-        
-        for item in all_items:
-            item_id = item.get("id")
-            remaining_hours = item.get("hours", 0) - hours_allocated_per_item.get(item_id, 0)
-            
-            if remaining_hours > 0:
-                deadline = item.get("deadline", "")
-                if deadline:
-                    try:
-                        deadline_date = datetime.strptime(deadline, "%Y-%m-%d")
-                        # Can schedule if deadline is on or after current date
-                        if deadline_date >= current_date_obj:
-                            available_items.append(item)
-                        else:
-                            print(f"DEBUG: Item {item.get('name')} deadline {deadline} is before {date}, skipping")
-                    except Exception as e:
-                        print(f"DEBUG: Error parsing deadline {deadline}: {e}, including item anyway")
-                        available_items.append(item)
-                else:
-                    # No deadline, include it
-                    available_items.append(item)
-        
-        print(f"DEBUG: Date {date} ({day_name}) has {len(available_items)} available items")
-        
-        # Sort available items by priority
-        available_items.sort(key=lambda x: (
-            priority_order.get(x.get("priority", "medium"), 2),
-            get_days_until_exam(x.get("due_date", ""))
-        ))
-        
-        hours_used_today = 0.0
-        slot_index = 0
-        
-        # Allocate items for this day
-        for item in available_items:
-            if hours_used_today >= available_hours_per_day or slot_index >= len(time_slots):
-                break
-            
-            item_id = item.get("id")
-            remaining_hours = item.get("hours", 0) - hours_allocated_per_item.get(item_id, 0)
-            
-            if remaining_hours > 0:
-                hours_to_allocate = min(1.0, remaining_hours, available_hours_per_day - hours_used_today)
-                
-                slot_data = {
-                    "time": time_slots[slot_index],
-                    "item_id": item_id,
-                    "item_name": item.get("name", ""),
-                    "category": item.get("category", ""),
-                    "subject_name": item.get("subject_name", ""),
-                    "hours": hours_to_allocate
-                }
-                day_plan["time_slots"].append(slot_data)
-                
-                hours_allocated_per_item[item_id] = hours_allocated_per_item.get(item_id, 0) + hours_to_allocate
-                hours_used_today += hours_to_allocate
-                slot_index += 1
-        
-        print(f"DEBUG: Day {day_name} allocated {len(day_plan['time_slots'])} slots")
-        if len(day_plan['time_slots']) > 0:
-            print(f"DEBUG: First slot for {day_name}: {day_plan['time_slots'][0]}")
-        study_plan.append(day_plan)
+    study_plan = ALLOCATION_ENGINES[engine](all_items, dates, available_hours_per_day, time_slots)
     
     print(f"DEBUG: Generated plan with {len(study_plan)} days, total slots: {sum(len(d['time_slots']) for d in study_plan)}")
     
@@ -0,0 +1,254 @@
+"""
+Background Model Training
+POST /api/ml/train submits a job instead of fitting inside the request. Jobs run
+one at a time in a separate process (so importing pandas and reading the training
+data never hold the API workers' GIL), publish a new registry version, and the
+resident model is reloaded when the job succeeds. A train request made while a
+job is already queued or running returns that job.
+
+Job records are JSON files in the registry's jobs directory, and the one-job-at-
+a-time guard is a lock file created exclusively there, so every API worker sees
+the same jobs and only one of them can start training at a time.
+"""
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from app.services.model_registry import REGISTRY_DIR, _write_atomic
+
+# "process" (default) or "thread"; threads avoid process start-up but share the GIL
+TRAINING_EXECUTOR = os.environ.get("TRAINING_EXECUTOR", "process")
+# Finished jobs remembered for the status endpoint
+TRAINING_JOBS_KEPT = int(os.environ.get("TRAINING_JOBS_KEPT", "50"))
+
+JOBS_DIR = os.path.join(REGISTRY_DIR, "jobs")
+LOCK_PATH = os.path.join(JOBS_DIR, "active.lock")
+
+_JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+def _train_worker() -> dict:
+    """Runs in the training process; returns the published version's metadata"""
+    from app.services import ml_model
+    document = ml_model.train_and_publish()
+    return {
+        "model_version": document["model_version"],
+        "trained_at": document["trained_at"],
+        "training_rows": document["training_rows"],
+        "training_seconds": document.get("training_seconds")
+    }
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class TrainingJobs:
+    """Submits training jobs to a single-worker executor and tracks their status"""
+
+    def __init__(self, executor_kind: str = TRAINING_EXECUTOR, jobs_kept: int = TRAINING_JOBS_KEPT):
+        self.executor_kind = executor_kind
+        self.jobs_kept = jobs_kept
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-training")
+            else:
+                # spawn: never fork a process that is running server threads
+                self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _read_job(self, job_id: str):
+        try:
+            with open(_job_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_job(self, job: dict):
+        _write_atomic(_job_path(job["job_id"]), json.dumps(job).encode("utf-8"))
+
+    def _read_lock(self):
+        try:
+            with open(LOCK_PATH) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _release_lock(self, job_id: str):
+        if self._read_lock() == job_id:
+            try:
+                os.remove(LOCK_PATH)
+            except FileNotFoundError:
+                pass
+
+    def _check_owner(self, job):
+        """Fail a queued or running job whose API worker has exited, releasing the guard"""
+        if job and job["status"] in ("queued", "running") and not _process_alive(job["worker_pid"]):
+            job.update(
+                status="failed",
+                error="The worker running this job exited",
+                finished_at=datetime.utcnow().isoformat()
+            )
+            self._write_job(job)
+            self._release_lock(job["job_id"])
+        return job
+
+    def _acquire(self, job: dict):
+        """
+        Take the single-job guard for job, whose record is already written. Returns
+        None when acquired, else the queued or running job that holds the guard.
+        """
+        temp_path = f"{LOCK_PATH}.{job['job_id']}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(job["job_id"])
+        try:
+            for _ in range(3):
+                try:
+                    # link() fails if the lock exists, and the lock never appears half-written
+                    os.link(temp_path, LOCK_PATH)
+                    return None
+                except FileExistsError:
+                    holder_id = self._read_lock()
+                    holder = self._check_owner(self._read_job(holder_id)) if holder_id else None
+                    if holder is not None and holder["status"] in ("queued", "running"):
+                        return holder
+                    # Left behind by a finished job or a worker that crashed
+                    self._release_lock(holder_id)
+            return self._read_job(self._read_lock() or "") or dict(
+                job, status="failed", error="Could not take the training lock"
+            )
+        finally:
+            os.remove(temp_path)
+
+    def _prune(self):
+        jobs = self.list()
+        for job in jobs[self.jobs_kept:]:
+            if job["status"] in ("succeeded", "failed"):
+                try:
+                    os.remove(_job_path(job["job_id"]))
+                except FileNotFoundError:
+                    pass
+
+    def submit(self) -> dict:
+        """Queue a training job, or return the one already queued or running"""
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        with self._lock:
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "status": "queued",
+                "submitted_at": datetime.utcnow().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "duration_seconds": None,
+                "model_version": None,
+                "training_rows": None,
+                "training_seconds": None,
+                "error": None,
+                "worker_pid": os.getpid()
+            }
+            self._write_job(job)
+            active = self._acquire(job)
+            if active is not None:
+                os.remove(_job_path(job_id))
+                return active
+            # Submission is inside the lock so a failed start cannot leave a stuck active job
+            try:
+                future = self._get_executor().submit(_train_worker)
+            except Exception as e:
+                self._finish(job, started=time.time(), error=str(e))
+                return dict(job)
+            job["status"] = "running"
+            job["started_at"] = datetime.utcnow().isoformat()
+            started = time.time()
+            self._write_job(job)
+        self._prune()
+        future.add_done_callback(lambda done: self._on_done(job, done, started))
+        return dict(job)
+
+    def _finish(self, job, started, result=None, error=None):
+        job["status"] = "failed" if error else "succeeded"
+        job["error"] = error
+        job["finished_at"] = datetime.utcnow().isoformat()
+        job["duration_seconds"] = round(time.time() - started, 4)
+        if result:
+            job["model_version"] = result["model_version"]
+            job["training_rows"] = result["training_rows"]
+            job["training_seconds"] = result["training_seconds"]
+        self._write_job(job)
+        self._release_lock(job["job_id"])
+
+    def _on_done(self, job, future, started):
+        error = None
+        result = None
+        try:
+            result = future.result()
+            # The job moved the registry pointer; install the new model here right away
+            from app.services.ml_model import model_holder
+            model_holder.reload()
+            print(f"DEBUG: Training job {job['job_id']} published model version {result['model_version']}")
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            if isinstance(e, BrokenProcessPool):
+                with self._lock:
+                    self._executor = None  # The training process died; start a new one next time
+            print(f"Error in training job {job['job_id']}: {error}")
+            traceback.print_exc()
+        with self._lock:
+            self._finish(job, started, result, error)
+
+    def get(self, job_id: str):
+        """A job submitted through any API worker, or None"""
+        if not _JOB_ID_PATTERN.match(job_id):
+            return None
+        return self._check_owner(self._read_job(job_id))
+
+    def list(self):
+        """Remembered jobs, newest first"""
+        if not os.path.isdir(JOBS_DIR):
+            return []
+        jobs = []
+        for name in os.listdir(JOBS_DIR):
+            job_id, extension = os.path.splitext(name)
+            if extension == ".json" and _JOB_ID_PATTERN.match(job_id):
+                job = self._check_owner(self._read_job(job_id))
+                if job is not None:
+                    jobs.append(job)
+        return sorted(jobs, key=lambda job: job["submitted_at"], reverse=True)
+
+    def wait(self, job_id: str, timeout: float = None):
+        """Block until the job has finished; returns its record"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in ("succeeded", "failed"):
+                return job
+            if deadline is not None and time.time() >= deadline:
+                return job
+            time.sleep(0.05)
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+training_jobs = TrainingJobs()
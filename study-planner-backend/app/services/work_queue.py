@@ -0,0 +1,195 @@
+"""
+Background Analysis Queue
+Assignment and exam writes enqueue the touched item instead of running clash
+detection and reminder generation before responding. A single worker thread
+debounces bursts of writes and coalesces them into one analysis run. Each item
+runs in its own transaction; failed items are retried a few times.
+"""
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+from app.models.database import SessionLocal
+from app.services.clash_detector import detect_clashes_for_item
+from app.services.reminder_service import generate_automatic_reminders
+
+# Quiet period after the last write before a run starts
+ANALYSIS_DEBOUNCE_SECONDS = float(os.environ.get("ANALYSIS_DEBOUNCE_SECONDS", "0.5"))
+# Upper bound on how long a continuous stream of writes can postpone a run
+ANALYSIS_MAX_DELAY_SECONDS = float(os.environ.get("ANALYSIS_MAX_DELAY_SECONDS", "5"))
+# Times a failing item (or reminder pass) is retried before it is given up
+ANALYSIS_MAX_ATTEMPTS = int(os.environ.get("ANALYSIS_MAX_ATTEMPTS", "3"))
+
+class AnalysisQueue:
+    """In-process, debounced queue of clash/reminder analysis work"""
+
+    def __init__(self, debounce_seconds: float = ANALYSIS_DEBOUNCE_SECONDS,
+                 max_delay_seconds: float = ANALYSIS_MAX_DELAY_SECONDS,
+                 max_attempts: int = ANALYSIS_MAX_ATTEMPTS):
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.max_attempts = max_attempts
+        self._failures = {}  # work key -> consecutive failed attempts
+        self._condition = threading.Condition()
+        self._pending = {}  # (item_type, item_id) -> first enqueue time
+        self._reminders_pending = False
+        self._last_enqueued_at = None
+        self._running = False
+        self._stopping = False
+        self._thread = None
+        self.enqueued = 0
+        self.coalesced = 0
+        self.runs = 0
+        self.items_processed = 0
+        self.retries = 0
+        self.given_up = 0
+        self.last_run_at = None
+        self.last_run_duration = None
+        self.last_run_lag = None
+        self.last_error = None
+
+    def enqueue(self, item_type: str, item_id: int, reminders: bool = False):
+        """Schedule clash detection for one item (and optionally reminder generation)"""
+        with self._condition:
+            now = time.time()
+            key = (item_type, item_id)
+            if key in self._pending:
+                self.coalesced += 1
+            else:
+                self._pending[key] = now
+            self._reminders_pending = self._reminders_pending or reminders
+            self._last_enqueued_at = now
+            self.enqueued += 1
+            self._ensure_worker()
+            self._condition.notify_all()
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._worker, name="analysis-queue", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        """Block until a debounced batch is ready; returns None once stopped and drained"""
+        with self._condition:
+            while True:
+                if not self._pending and not self._reminders_pending:
+                    if self._stopping:
+                        return None
+                    self._condition.wait()
+                    continue
+                now = time.time()
+                oldest = min(self._pending.values()) if self._pending else self._last_enqueued_at
+                quiet_for = now - self._last_enqueued_at
+                waited = now - oldest
+                if self._stopping or quiet_for >= self.debounce_seconds or waited >= self.max_delay_seconds:
+                    batch = (dict(self._pending), self._reminders_pending)
+                    self._pending.clear()
+                    self._reminders_pending = False
+                    self._running = True
+                    return batch
+                self._condition.wait(min(self.debounce_seconds - quiet_for, self.max_delay_seconds - waited))
+
+    def _run_step(self, db, key, step) -> bool:
+        """Run one item (or the reminder pass) in its own transaction; False if it failed"""
+        try:
+            step()
+            self._failures.pop(key, None)
+            return True
+        except Exception as e:
+            db.rollback()
+            self.last_error = f"{key}: {e}"
+            print(f"Error in background analysis of {key}: {e}")
+            traceback.print_exc()
+            return False
+
+    def _retry(self, failed_items, reminders_failed: bool):
+        """Put failed work back on the queue until it has failed max_attempts times"""
+        with self._condition:
+            now = time.time()
+            retried = False
+            for key in list(failed_items) + (["reminders"] if reminders_failed else []):
+                attempts = self._failures.get(key, 0) + 1
+                if attempts >= self.max_attempts:
+                    self._failures.pop(key, None)
+                    self.given_up += 1
+                    print(f"Error: giving up background analysis of {key} after {attempts} attempts")
+                    continue
+                self._failures[key] = attempts
+                if key == "reminders":
+                    self._reminders_pending = True
+                else:
+                    self._pending.setdefault(key, failed_items[key])
+                self.retries += 1
+                retried = True
+            if retried:
+                self._last_enqueued_at = now  # Retry after the debounce period
+                self._condition.notify_all()
+
+    def _worker(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            items, reminders = batch
+            started = time.time()
+            failed_items = {}
+            reminders_failed = False
+            db = SessionLocal()
+            try:
+                # One failing item must not drop the rest of the batch
+                for item_type, item_id in items:
+                    key = (item_type, item_id)
+                    if not self._run_step(db, key, lambda: detect_clashes_for_item(db, item_type, item_id)):
+                        failed_items[key] = items[key]
+                if reminders:
+                    reminders_failed = not self._run_step(db, "reminders", lambda: generate_automatic_reminders(db))
+                if not failed_items and not reminders_failed:
+                    self.last_error = None
+            finally:
+                db.close()
+                if failed_items or reminders_failed:
+                    self._retry(failed_items, reminders_failed)
+                finished = time.time()
+                with self._condition:
+                    self._running = False
+                    self.runs += 1
+                    self.items_processed += len(items) - len(failed_items)
+                    self.last_run_at = finished
+                    self.last_run_duration = finished - started
+                    self.last_run_lag = finished - min(items.values()) if items else None
+                    self._condition.notify_all()
+
+    def stop(self, timeout: float = 10.0):
+        """Drain pending work and stop the worker"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def status(self) -> dict:
+        with self._condition:
+            now = time.time()
+            oldest = min(self._pending.values()) if self._pending else None
+            return {
+                "depth": len(self._pending),
+                "reminders_pending": self._reminders_pending,
+                "lag_seconds": round(now - oldest, 3) if oldest else 0.0,
+                "running": self._running,
+                "worker_alive": self._thread is not None and self._thread.is_alive(),
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "runs": self.runs,
+                "items_processed": self.items_processed,
+                "retries": self.retries,
+                "given_up": self.given_up,
+                "last_run_at": datetime.utcfromtimestamp(self.last_run_at).isoformat() if self.last_run_at else None,
+                "last_run_duration_seconds": self.last_run_duration,
+                "last_run_lag_seconds": self.last_run_lag,
+                "last_error": self.last_error
+            }
+
+analysis_queue = AnalysisQueue()
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 def get_days_until_exam(exam_date_str: str) -> int:
     """Calculate days until exam date"""
@@ -50,3 +50,32 @@ def get_day_name(date_str: str) -> str:
     except:
         return "Unknown"
 
+
+def get_date_ordinal(date_str: str):
+    """
+    Parse a YYYY-MM-DD date into a day ordinal, or None if it cannot be parsed.
+    Canonical zero-padded dates take the fast ISO path; anything else falls back
+    to strptime so lenient inputs like 2024-1-5 behave as before.
+    """
+    if not date_str:
+        return None
+    try:
+        if len(date_str) == 10 and date_str[4] == "-" and date_str[7] == "-":
+            return date.fromisoformat(date_str).toordinal()
+        return datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return None
+
+def normalize_date(date_str: str):
+    """Zero-padded YYYY-MM-DD for any date get_date_ordinal accepts; other values are returned unchanged"""
+    ordinal = get_date_ordinal(date_str)
+    if ordinal is None:
+        return date_str
+    return date.fromordinal(ordinal).isoformat()
+
+def get_days_left_at(exam_date_str: str, created_at: datetime) -> int:
+    """Days from when an item was added to its date, i.e. what its prediction was based on"""
+    exam_day = get_date_ordinal(exam_date_str)
+    if exam_day is not None and created_at:
+        return max(0, exam_day - created_at.date().toordinal())
+    return get_days_until_exam(exam_date_str)
@@ -11,3 +11,13 @@ def calculate_priority(difficulty: str, days_until_exam: int, past_score: float)
     else:
         return "medium"
 
+def priority_for_days_left(days_left: int) -> str:
+    """Priority of an assignment or exam from the days left until it is due"""
+    if days_left <= 3:
+        return "urgent"
+    elif days_left <= 7:
+        return "high"
+    elif days_left > 30:
+        return "low"
+    else:
+        return "medium"
@@ -0,0 +1,291 @@
+"""
+Study Hours Model Benchmark
+Evaluates candidate models on the training data with k-fold cross-validation
+(MAE, RMSE and R^2 of the predictions as served, i.e. clamped to at least one
+hour and rounded) and measures what each costs to serve: single-row and batch
+prediction latency through the served predict_hours / predict_hours_batch,
+artifact size, cold load time and import time. Results are printed as a table
+and written as a JSON report.
+
+Run from study-planner-backend:
+    python -m benchmarks.ml_benchmark [--folds 5] [--feedback] [--output ml_benchmark_report.json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import pickle
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+from app.services import ml_model
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SINGLE_ROW_REPEATS = 2000
+BATCH_ROWS = 10000
+COLD_START_RUNS = 5
+DIFFICULTY_NAMES = {level: name for name, level in ml_model.DIFFICULTY_LEVELS.items()}
+
+class NormalEquationsModel:
+    """The production trainer (streamed normal equations) behind a fit/predict interface"""
+
+    def fit(self, X, y):
+        training = ml_model.TrainingStatistics(X.shape[1])
+        training.add(X, y)
+        self.coef_, self.intercept_ = training.solve()
+        return self
+
+    def predict(self, X):
+        return X @ self.coef_ + self.intercept_
+
+class PickledModelServing:
+    """predict_hours / predict_hours_batch as a non-linear candidate would have to serve them"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict_hours(self, past_score: float, difficulty: str, chapters: int, days_left: int) -> float:
+        difficulty_level = ml_model.DIFFICULTY_LEVELS.get(difficulty.lower(), 1)
+        features = np.array([[past_score, difficulty_level, chapters, days_left]], dtype=np.float64)
+        return max(1.0, round(float(self.model.predict(features)[0]), 2))
+
+    def predict_hours_batch(self, past_scores, difficulty_levels, chapters, days_left) -> list:
+        columns = (past_scores, difficulty_levels, chapters, days_left)
+        features = np.column_stack([np.asarray(column, dtype=np.float64) for column in columns])
+        return [max(1.0, round(value, 2)) for value in self.model.predict(features).tolist()]
+
+@contextlib.contextmanager
+def resident_model(document: dict):
+    """
+    Serve document through ml_model's own predict functions. A private holder that
+    never re-checks a pointer replaces the resident model, so the live registry is
+    neither read nor written.
+    """
+    live_holder = ml_model.model_holder
+    with tempfile.TemporaryDirectory() as directory:
+        holder = ml_model.ModelHolder(path=os.path.join(directory, "current.json"), check_interval=float("inf"))
+        holder.swap(ml_model.validate_model(document))
+        ml_model.model_holder = holder
+        try:
+            yield ml_model
+        finally:
+            ml_model.model_holder = live_holder
+
+def make_candidates():
+    """name -> (factory, linear); linear models are served from exported coefficients"""
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.linear_model import LinearRegression, Ridge
+
+    return {
+        "normal_equations": (NormalEquationsModel, True),
+        "linear_regression": (LinearRegression, True),
+        "ridge": (lambda: Ridge(alpha=1.0), True),
+        "gbm": (lambda: GradientBoostingRegressor(n_estimators=50, max_depth=2, learning_rate=0.1, random_state=0), False)
+    }
+
+def load_dataset(path: str, include_feedback: bool):
+    X_parts, y_parts = [], []
+    for X, y in ml_model.csv_training_chunks(path):
+        X_parts.append(X)
+        y_parts.append(y)
+    if include_feedback:
+        for X, y in ml_model.exam_training_chunks():
+            X_parts.append(X)
+            y_parts.append(y)
+    return np.vstack(X_parts), np.concatenate(y_parts)
+
+def served(predictions):
+    """Apply the same clamping and rounding as predict_hours"""
+    return np.maximum(1.0, np.round(predictions, 2))
+
+def cross_validate(factory, X, y, folds: int, seed: int = 42):
+    """Out-of-fold error metrics over a shuffled k-fold split"""
+    order = np.random.default_rng(seed).permutation(len(y))
+    predictions = np.empty(len(y))
+    for fold in np.array_split(order, folds):
+        train = np.setdiff1d(order, fold, assume_unique=True)
+        model = factory().fit(X[train], y[train])
+        predictions[fold] = served(model.predict(X[fold]))
+    errors = predictions - y
+    total = float(((y - y.mean()) ** 2).sum())
+    return {
+        "mae": float(np.abs(errors).mean()),
+        "rmse": float(np.sqrt((errors ** 2).mean())),
+        "r2": 1.0 - float((errors ** 2).sum()) / total if total else None
+    }
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p95_us": samples[int(len(samples) * 0.95)] * 1e6,
+        "p99_us": samples[int(len(samples) * 0.99)] * 1e6
+    }
+
+def export_linear(model, training_rows: int) -> dict:
+    return ml_model.export_coefficients(model.coef_, model.intercept_, training_rows)
+
+def measure_serving(model, linear: bool, X):
+    """
+    Single-row latency, batch throughput and artifact size for a fitted model.
+    Linear models are timed through ml_model.predict_hours / predict_hours_batch
+    with their exported document resident; others through PickledModelServing.
+    """
+    past_score, difficulty_level, chapters, days_left = X[0].tolist()
+    single = (past_score, DIFFICULTY_NAMES.get(int(difficulty_level), "medium"), int(chapters), int(days_left))
+    # Feature columns as lists, the way the /predict-batch endpoint passes them
+    columns = [column.tolist() for column in X[np.arange(BATCH_ROWS) % len(X)].T]
+    if linear:
+        document = export_linear(model, len(X))
+        artifact = json.dumps(document).encode("utf-8")
+        load = lambda: ml_model.validate_model(json.loads(artifact))
+        serving = resident_model(document)
+    else:
+        artifact = pickle.dumps(model)
+        load = lambda: pickle.loads(artifact)
+        serving = contextlib.nullcontext(PickledModelServing(model))
+
+    samples = []
+    batch_times = []
+    with serving as service:
+        for _ in range(SINGLE_ROW_REPEATS):
+            started = time.perf_counter()
+            service.predict_hours(*single)
+            samples.append(time.perf_counter() - started)
+
+        for _ in range(5):
+            started = time.perf_counter()
+            service.predict_hours_batch(*columns)
+            batch_times.append(time.perf_counter() - started)
+
+    load_times = []
+    for _ in range(20):
+        started = time.perf_counter()
+        load()
+        load_times.append(time.perf_counter() - started)
+
+    batch_seconds = min(batch_times)
+    return {
+        "single_row": percentiles(samples),
+        "batch_rows": BATCH_ROWS,
+        "batch_seconds": batch_seconds,
+        "batch_rows_per_second": BATCH_ROWS / batch_seconds if batch_seconds else None,
+        "artifact_bytes": len(artifact),
+        "artifact_load_seconds": statistics.median(load_times)
+    }
+
+def run_in_subprocess(code: str, data_dir: str = None, stdin: str = None) -> str:
+    """Run code in a fresh interpreter, with MODEL_DATA_DIR pointed at data_dir if given"""
+    env = dict(os.environ, MODEL_DATA_DIR=data_dir) if data_dir else None
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, input=stdin, capture_output=True, text=True, check=True
+    ).stdout
+
+def time_in_subprocess(code: str, data_dir: str = None):
+    """Run code that prints a JSON dict of timings and return the dict"""
+    return json.loads(run_in_subprocess(code, data_dir).strip().splitlines()[-1])
+
+def seed_registry(document: dict, data_dir: str):
+    """Publish document as the only version of a registry under data_dir"""
+    run_in_subprocess(
+        "import json, sys; from app.services import model_registry;"
+        "model_registry.publish_model(json.load(sys.stdin), source='benchmark')",
+        data_dir,
+        stdin=json.dumps(document)
+    )
+
+def measure_cold_start(document: dict, runs: int = COLD_START_RUNS):
+    """
+    Fresh-process import and first-load times of the serving module. Every run
+    loads document from its own copy of a seeded temporary registry, so nothing is
+    trained and the live registry is never touched.
+    """
+    service = (
+        "import json, time; started = time.perf_counter();"
+        "from app.services import ml_model; imported = time.perf_counter();"
+        "ml_model.get_model(); loaded = time.perf_counter();"
+        "print(json.dumps({'import': imported - started, 'load': loaded - imported}))"
+    )
+    gbm_runtime = (
+        "import json, time; started = time.perf_counter();"
+        "import sklearn.ensemble;"
+        "print(json.dumps({'import': time.perf_counter() - started}))"
+    )
+    service_runs = []
+    with tempfile.TemporaryDirectory() as root:
+        seeded = os.path.join(root, "seed")
+        seed_registry(document, seeded)
+        for run in range(runs):
+            data_dir = os.path.join(root, f"run-{run}")
+            shutil.copytree(seeded, data_dir)
+            service_runs.append(time_in_subprocess(service, data_dir))
+    gbm_runs = [time_in_subprocess(gbm_runtime) for _ in range(runs)]
+    return {
+        "runs": runs,
+        "ml_model_import_seconds": statistics.median(run["import"] for run in service_runs),
+        "model_load_seconds": statistics.median(run["load"] for run in service_runs),
+        # Extra import a non-linear candidate would add to every worker
+        "sklearn_ensemble_import_seconds": statistics.median(run["import"] for run in gbm_runs)
+    }
+
+def run_benchmark(path: str, folds: int, include_feedback: bool):
+    X, y = load_dataset(path, include_feedback)
+    folds = max(2, min(folds, len(y)))
+    production = export_linear(NormalEquationsModel().fit(X, y), len(y))
+    results = {}
+    for name, (factory, linear) in make_candidates().items():
+        started = time.perf_counter()
+        model = factory().fit(X, y)
+        fit_seconds = time.perf_counter() - started
+        results[name] = {
+            "serving": "linear-json" if linear else "pickle",
+            "fit_seconds": fit_seconds,
+            "cross_validation": cross_validate(factory, X, y, folds),
+            **measure_serving(model, linear, X)
+        }
+    return {
+        "generated_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "dataset": {"path": os.path.abspath(path), "rows": int(len(y)), "exam_feedback": include_feedback},
+        "folds": folds,
+        "candidates": results,
+        "cold_start": measure_cold_start(production)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate and time study-hours model candidates")
+    parser.add_argument("--data", default=ml_model.TRAINING_FILE, help="training CSV")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--feedback", action="store_true", help="also use exams with reported actual hours")
+    parser.add_argument("--output", default="ml_benchmark_report.json", help="JSON report path")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.data, args.folds, args.feedback)
+    print(f"{report['dataset']['rows']} rows, {report['folds']}-fold cross-validation")
+    print(f"{'model':>18} {'MAE':>7} {'RMSE':>7} {'R^2':>7} {'fit (ms)':>9} {'p50 (us)':>9} {'p99 (us)':>9} {'batch rows/s':>13} {'bytes':>7}")
+    for name, result in report["candidates"].items():
+        metrics = result["cross_validation"]
+        r2 = f"{metrics['r2']:>7.3f}" if metrics["r2"] is not None else f"{'-':>7}"
+        print(
+            f"{name:>18} {metrics['mae']:>7.3f} {metrics['rmse']:>7.3f} {r2} {result['fit_seconds'] * 1000:>9.2f} "
+            f"{result['single_row']['p50_us']:>9.1f} {result['single_row']['p99_us']:>9.1f} "
+            f"{result['batch_rows_per_second']:>13.0f} {result['artifact_bytes']:>7}"
+        )
+    cold = report["cold_start"]
+    print(
+        f"cold start: import {cold['ml_model_import_seconds']:.3f}s, first load {cold['model_load_seconds']:.3f}s, "
+        f"sklearn.ensemble import {cold['sklearn_ensemble_import_seconds']:.3f}s"
+    )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
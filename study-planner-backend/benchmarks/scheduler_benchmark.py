@@ -0,0 +1,93 @@
+"""
+Scheduler Allocation Benchmark
+Compares the event-driven heap allocator and the NumPy capacity matrix engine
+against the reference daily-scan greedy, checks all of them produce identical
+plans, and reports how they scale with item count and horizon length.
+
+Run from study-planner-backend:
+    python -m benchmarks.scheduler_benchmark
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from app.services.scheduler import allocate_time_slots, allocate_by_daily_scan
+from app.services.capacity_matrix import allocate_with_capacity_matrix
+from app.utils.date_utils import get_days_until_exam, get_date_range
+
+PRIORITY_ORDER = {"urgent": 0, "high": 1, "medium": 2, "low": 3}
+
+def make_items(item_count: int, horizon_days: int, seed: int = 42):
+    """Build sorted synthetic items shaped like detect_and_handle_clashes output"""
+    rng = random.Random(seed)
+    today = datetime.now()
+    items = []
+    for i in range(item_count):
+        category = "assignment" if i % 2 == 0 else "exam"
+        deadline = (today + timedelta(days=rng.randint(0, horizon_days))).strftime("%Y-%m-%d")
+        items.append({
+            # Assignment and exam ids overlap, as they do in the database
+            "id": i // 2 + 1,
+            "name": f"{category.title()} {i}",
+            "category": category,
+            "hours": round(rng.uniform(0.5, 20.0), 2),
+            "priority": rng.choice(list(PRIORITY_ORDER)),
+            "due_date": deadline,
+            "subject_name": f"Subject {i % 12}",
+            "deadline": deadline
+        })
+    items.sort(key=lambda x: (
+        PRIORITY_ORDER.get(x.get("priority", "medium"), 2),
+        get_days_until_exam(x.get("due_date", ""))
+    ))
+    return items
+
+def time_allocator(allocator, items, dates, hours_per_day, time_slots):
+    started = time.perf_counter()
+    plan = allocator(items, dates, hours_per_day, time_slots)
+    return plan, time.perf_counter() - started
+
+def run_case(item_count: int, horizon_days: int, hours_per_day: float = 8, include_scan: bool = True):
+    items = make_items(item_count, horizon_days)
+    start = datetime.now()
+    dates = get_date_range(start.strftime("%Y-%m-%d"), (start + timedelta(days=horizon_days)).strftime("%Y-%m-%d"))
+    time_slots = [f"{9 + i:02d}:00-{10 + i:02d}:00" for i in range(int(hours_per_day))]
+
+    heap_plan, heap_seconds = time_allocator(allocate_time_slots, items, dates, hours_per_day, time_slots)
+    matrix_plan, matrix_seconds = time_allocator(allocate_with_capacity_matrix, items, dates, hours_per_day, time_slots)
+    identical = matrix_plan == heap_plan
+    scan_seconds = None
+    if include_scan:
+        scan_plan, scan_seconds = time_allocator(allocate_by_daily_scan, items, dates, hours_per_day, time_slots)
+        identical = identical and scan_plan == heap_plan
+
+    return {
+        "items": item_count,
+        "days": len(dates),
+        "slots": sum(len(day["time_slots"]) for day in heap_plan),
+        "scan_seconds": scan_seconds,
+        "heap_seconds": heap_seconds,
+        "matrix_seconds": matrix_seconds,
+        "identical": identical
+    }
+
+def main():
+    # (items, horizon days, include the slow reference scan)
+    cases = [
+        (100, 30, True), (100, 120, True), (100, 365, True),
+        (1000, 30, True), (1000, 120, True), (1000, 365, True),
+        (3000, 120, True), (3000, 365, True),
+        (5000, 730, False), (10000, 1460, False),
+    ]
+    print(f"{'items':>6} {'days':>5} {'slots':>6} {'scan (s)':>10} {'heap (s)':>10} {'matrix (s)':>10} identical")
+    for item_count, horizon_days, include_scan in cases:
+        result = run_case(item_count, horizon_days, include_scan=include_scan)
+        scan = f"{result['scan_seconds']:>10.4f}" if result["scan_seconds"] is not None else f"{'-':>10}"
+        print(
+            f"{result['items']:>6} {result['days']:>5} {result['slots']:>6} {scan} "
+            f"{result['heap_seconds']:>10.4f} {result['matrix_seconds']:>10.4f} {result['identical']}"
+        )
+        if not result["identical"]:
+            raise SystemExit("Allocation engines diverged from each other")
+
+if __name__ == "__main__":
+    main()
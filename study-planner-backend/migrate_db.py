@@ -2,12 +2,20 @@
 Database Migration Script
 Run this script to update the database schema
 """
-from app.models.database import migrate_subjects_table, migrate_study_plans_table, init_db
+from app.models.database import migrate_subjects_table, migrate_exams_table, migrate_study_plans_table, migrate_notifications_table, migrate_item_dates, migrate_indexes, migrate_resource_versions, migrate_job_runs_table, migrate_auto_vacuum, init_db
 
 if __name__ == "__main__":
     print("Running database migration...")
     init_db()
     migrate_subjects_table()
+    migrate_exams_table()
+    migrate_job_runs_table()
     migrate_study_plans_table()
+    migrate_notifications_table()
+    migrate_item_dates()
+    migrate_indexes()
+    migrate_resource_versions()
+    # Rewrites the whole database file once; run with the API stopped
+    migrate_auto_vacuum()
     print("Migration completed!")
 
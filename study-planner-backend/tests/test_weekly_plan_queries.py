@@ -0,0 +1,111 @@
+"""
+/api/planner/weekly must issue a constant number of SQL statements however many
+plan rows there are: no per-slot subject lookups (N+1).
+"""
+import os
+import sys
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DAILY_JOBS_ENABLED", "0")
+
+MAX_WEEKLY_QUERIES = 4  # ETag counter read, active plan rows, legacy subject names per item type
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # The database URL is relative, so run against a fresh database in a temp dir
+    previous_dir = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("weekly"))
+    from fastapi.testclient import TestClient
+    from app.main import app
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        os.chdir(previous_dir)
+
+@contextmanager
+def count_queries():
+    from app.models.database import engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def seed_plan(slot_count: int):
+    """
+    Replace the active plan with slot_count rows over a few subjects. Every other
+    row has no stored subject_name, like rows saved before the column existed.
+    """
+    from app.models.database import SessionLocal, Subject, Assignment, Exam
+    from app.models import plan as plan_model
+
+    db = SessionLocal()
+    try:
+        plan_model.clear_all_plans(db)
+        db.query(Assignment).delete()
+        db.query(Exam).delete()
+        db.query(Subject).delete()
+        start = date.today()
+        for index in range(3):
+            db.add(Subject(name=f"Subject {index}"))
+            db.add(Assignment(
+                id=index + 1, name=f"Assignment {index}", subject_name=f"Subject {index}",
+                due_date=(start + timedelta(days=10)).isoformat(), estimated_hours=5
+            ))
+            db.add(Exam(
+                id=index + 1, name=f"Exam {index}", subject_name=f"Subject {index}",
+                exam_date=(start + timedelta(days=12)).isoformat()
+            ))
+        db.commit()
+
+        rows = []
+        for index in range(slot_count):
+            item_type = "assignment" if index % 2 == 0 else "exam"
+            slot_date = start + timedelta(days=index // 4)
+            rows.append({
+                "item_id": index % 3 + 1,
+                "item_type": item_type,
+                "item_name": f"{item_type.title()} {index % 3}",
+                "subject_name": f"Subject {index % 3}" if index % 4 < 2 else None,
+                "day": slot_date.strftime("%A"),
+                "date": slot_date.isoformat(),
+                "time_slot": f"{9 + index % 4:02d}:00-{10 + index % 4:02d}:00",
+                "hours": 1.0,
+                "category": item_type
+            })
+        plan_model.save_plan_version(db, rows)
+    finally:
+        db.close()
+
+def weekly_query_count(client, slot_count: int, **params) -> int:
+    seed_plan(slot_count)
+    with count_queries() as statements:
+        response = client.get("/api/planner/weekly", params=params)
+    assert response.status_code == 200
+    assert sum(len(day["time_slots"]) for day in response.json()) == slot_count
+    assert all(slot["subject_name"] != "N/A" for day in response.json() for slot in day["time_slots"])
+    return len(statements)
+
+def test_weekly_query_count_is_constant(client):
+    small = weekly_query_count(client, 5)
+    large = weekly_query_count(client, 50)
+    assert small == large
+    assert large <= MAX_WEEKLY_QUERIES
+
+def test_weekly_page_query_count_is_constant(client):
+    params = {"from": date.today().isoformat(), "days": 366}
+    small = weekly_query_count(client, 5, **params)
+    large = weekly_query_count(client, 50, **params)
+    assert small == large
+    assert large <= MAX_WEEKLY_QUERIES + 1  # Plus the distinct-dates page query
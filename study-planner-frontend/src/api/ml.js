@@ -2,9 +2,23 @@ import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:8000/api/ml';
 
+export const getTrainingJob = async (jobId) => {
+  const response = await axios.get(`${API_BASE_URL}/train/jobs/${jobId}`);
+  return response.data;
+};
+
+// Training runs as a background job; poll it until the new model is active
 export const trainModel = async () => {
   const response = await axios.post(`${API_BASE_URL}/train`);
-  return response.data;
+  let job = response.data;
+  while (job.status === 'queued' || job.status === 'running') {
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+    job = await getTrainingJob(job.job_id);
+  }
+  if (job.status === 'failed') {
+    throw new Error(job.error || 'Model training failed');
+  }
+  return { ...job, message: `Model trained successfully! (version ${job.model_version})` };
 };
 
 export const predictHours = async (pastScore, difficulty, chapters, daysLeft) => {